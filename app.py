@@ -1,8 +1,20 @@
 from flask import Flask, jsonify, request
-from flask import Flask, send_from_directory
+from flask import Flask, send_from_directory, Response
 from flask_cors import CORS
+from collections import OrderedDict
+from functools import wraps
+import base64
+import gzip
+import json
 import sys
 import os
+import threading
+import zlib
+
+try:
+    import brotli  # opcional: sem ele as respostas em cache saem só em gzip
+except ImportError:
+    brotli = None
 
 try:
     from sistema_filmes import Filme, NoAVL, ArvoreAVL, Grafo, SistemaRecomendacao
@@ -73,21 +85,127 @@ def encontrar_csv():
 # Inicializa o sistema
 ARQUIVO_DADOS = encontrar_csv()
 sistema = None
+trava_inicializacao = threading.Lock()
 
 
 def inicializar_sistema(dados=None):
-    """Carrega o sistema de recomendação na primeira requisição"""
+    """
+    Carrega o sistema de recomendação na primeira requisição. Só publica o sistema
+    depois de carregado: pedidos simultâneos esperam a carga em vez de vê-lo vazio.
+    """
     global sistema, ARQUIVO_DADOS
     if sistema is None:
-        print("🎬 Inicializando sistema de recomendação...")
-        if dados is None:
-            dados = ARQUIVO_DADOS
-        sistema = SistemaRecomendacao(dados)
-        sistema.carregar_dados()
-        print("✅ Sistema pronto!")
+        with trava_inicializacao:
+            if sistema is None:
+                print("🎬 Inicializando sistema de recomendação...")
+                if dados is None:
+                    dados = ARQUIVO_DADOS
+                novo = SistemaRecomendacao(dados)
+                novo.carregar_dados()
+                exibir_estatisticas_carga(novo.estatisticas_carga)
+                sistema = novo
+                print("✅ Sistema pronto!")
     return sistema
 
 
+def exibir_estatisticas_carga(estatisticas):
+    """Mostra no console como foi a carga (o SistemaRecomendacao só registra)."""
+    if estatisticas.get('origem') == 'snapshot':
+        print(f"Snapshot carregado: {estatisticas['filmes']} filmes ({estatisticas['arquivo']})")
+    elif 'linhas' in estatisticas:
+        print(f"CSV lido: {estatisticas['linhas']} linhas em {estatisticas['segundos']:.2f}s "
+              f"({estatisticas['linhas_por_segundo']:.0f} linhas/s), "
+              f"{estatisticas['duplicadas']} duplicadas ignoradas, "
+              f"{estatisticas['filmes']} filmes.")
+    elif 'primeira_linha' in estatisticas:
+        print("Primeira linha processável:", estatisticas['primeira_linha'])
+    if 'aviso_snapshot' in estatisticas:
+        print(f"Aviso: {estatisticas['aviso_snapshot']}")
+    if 'recomendacoes_precalculadas' in estatisticas:
+        print(f"⚡ Recomendações pré-calculadas carregadas: {estatisticas['recomendacoes_precalculadas']} filmes")
+
+
+# ==================== CACHE DE RESPOSTAS ====================
+
+MAX_RESPOSTAS_EM_CACHE = 64
+TAMANHO_MINIMO_COMPRESSAO = 1024  # bytes; abaixo disso comprimir não compensa
+
+# (rota, argumentos da query) -> RespostaEmCache, da menos para a mais usada
+cache_respostas = OrderedDict()
+trava_respostas = threading.Lock()
+
+
+class RespostaEmCache:
+    """Corpo JSON já codificado, com ETag e as versões comprimidas (feitas uma vez só)."""
+
+    def __init__(self, versao, corpo, mimetype):
+        self.versao = versao
+        self.corpo = corpo
+        self.mimetype = mimetype
+        self.etag = f'{versao}-{zlib.crc32(corpo):08x}'
+        self.comprimidos = {}  # 'gzip'/'br' -> bytes
+
+    def corpo_codificado(self, codificacao):
+        if codificacao is None:
+            return self.corpo
+        if codificacao not in self.comprimidos:
+            if codificacao == 'br':
+                self.comprimidos[codificacao] = brotli.compress(self.corpo)
+            else:
+                self.comprimidos[codificacao] = gzip.compress(self.corpo)
+        return self.comprimidos[codificacao]
+
+
+def resposta_em_cache(*argumentos):
+    """
+    Guarda a resposta da rota por (caminho, `argumentos` da query que ela lê) enquanto
+    a versão do catálogo não mudar: os pedidos seguintes não refazem o JSON, recebem
+    304 se mandarem o ETag em If-None-Match e levam o corpo em gzip/brotli conforme
+    o Accept-Encoding. Outros parâmetros (ex.: ?_=timestamp) não criam entradas novas.
+    Respostas de erro e em streaming passam direto, sem cache.
+    """
+    def decorador(funcao):
+        @wraps(funcao)
+        def envolvida(*args, **kwargs):
+            s = inicializar_sistema()
+            chave = (request.path, tuple((nome, tuple(request.args.getlist(nome))) for nome in argumentos))
+            with trava_respostas:
+                entrada = cache_respostas.get(chave)
+                if entrada is not None and entrada.versao == s.versao_catalogo:
+                    cache_respostas.move_to_end(chave)
+                else:
+                    entrada = None
+
+            if entrada is None:
+                versao = s.versao_catalogo  # lida antes de gerar: se mudar no meio, refaz depois
+                resposta = app.make_response(funcao(*args, **kwargs))
+                if resposta.status_code != 200 or resposta.is_streamed:
+                    return resposta
+                entrada = RespostaEmCache(versao, resposta.get_data(), resposta.mimetype)
+                with trava_respostas:
+                    cache_respostas[chave] = entrada
+                    cache_respostas.move_to_end(chave)
+                    while len(cache_respostas) > MAX_RESPOSTAS_EM_CACHE:
+                        cache_respostas.popitem(last=False)
+
+            if request.if_none_match.contains_weak(entrada.etag):
+                resposta = Response(status=304)
+            else:
+                codificacao = None
+                if len(entrada.corpo) >= TAMANHO_MINIMO_COMPRESSAO:
+                    codificacao = request.accept_encodings.best_match(['br', 'gzip'] if brotli else ['gzip'])
+                resposta = Response(entrada.corpo_codificado(codificacao), mimetype=entrada.mimetype)
+                if codificacao:
+                    resposta.headers['Content-Encoding'] = codificacao
+            resposta.set_etag(entrada.etag, weak=True)
+            resposta.vary.add('Accept-Encoding')
+            return resposta
+
+        return envolvida
+
+    return decorador
+
+
 # ==================== ENDPOINTS DA API ====================
 
 @app.route('/api/status', methods=['GET'])
@@ -99,6 +217,12 @@ def status():
         return jsonify({
             'status': 'online',
             'total_filmes': total,
+            'versao_catalogo': s.versao_catalogo,
+            'cache_recomendacoes': {
+                'entradas': len(s.cache_recomendacoes),
+                'acertos': s.cache_recomendacoes.acertos,
+                'faltas': s.cache_recomendacoes.faltas
+            },
             'message': f'Sistema carregado com {total} filmes'
         })
     except Exception as e:
@@ -121,23 +245,55 @@ def home():
     return send_from_directory('.', 'home.html')
 
 
+def codificar_cursor(filme):
+    """Cursor opaco de paginação: a chave normalizada do último título entregue."""
+    return base64.urlsafe_b64encode(filme.chave.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Chave de título contida no cursor (vazio = começo). Lança ValueError se inválido."""
+    if not cursor:
+        return None
+    try:
+        return base64.b64decode(cursor + '=' * (-len(cursor) % 4), altchars=b'-_', validate=True).decode('utf-8')
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Cursor inválido')
+
+
 @app.route('/api/filmes', methods=['GET'])
 def listar_filmes():
-    """Lista todos os filmes (paginado)"""
+    """
+    Lista todos os filmes (paginado)
+    Query params:
+    - page/per_page: paginação por número de página
+    - cursor: paginação por cursor (vazio na primeira página, depois o 'proximo_cursor'
+      recebido); continua do último título visto, sem pular nem repetir filmes
+      quando outros são incluídos ou removidos entre os pedidos
+    """
     try:
         s = inicializar_sistema()
 
         # Parâmetros de paginação
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 20))
-
-        # Busca todos os filmes ordenados
-        filmes = s.avl.travessia_em_ordem(s.avl_root)
-
-        # Paginação
-        start = (page - 1) * per_page
-        end = start + per_page
-        filmes_pagina = filmes[start:end]
+        usa_cursor = 'cursor' in request.args
+        if per_page < 1:
+            raise ValueError('per_page deve ser positivo')
+        if page < 1:
+            raise ValueError('page deve ser positivo')
+
+        if usa_cursor:
+            # Busca na AVL a partir da chave do cursor: O(log n + per_page).
+            # Um filme a mais só para saber se há próxima página
+            apos = decodificar_cursor(request.args['cursor'])
+            filmes_pagina = list(s.avl.iterar_em_ordem(s.avl_root, apos=apos, limite=per_page + 1))
+            tem_mais = len(filmes_pagina) > per_page
+            filmes_pagina = filmes_pagina[:per_page]
+        else:
+            # Paginação por posto na AVL: O(log n + per_page)
+            start = (page - 1) * per_page
+            filmes_pagina = list(s.avl.iterar_em_ordem(s.avl_root, offset=start, limite=per_page))
+        total = s.avl.tamanho(s.avl_root)
 
         # Converte para formato JSON
         resultado = []
@@ -151,14 +307,24 @@ def listar_filmes():
                 'img': f'https://placehold.co/220x330/1e0730/a855f7?text={f.titulo[:15].replace(" ", "+")}'
             })
 
+        if usa_cursor:
+            return jsonify({
+                'filmes': resultado,
+                'total': total,
+                'per_page': per_page,
+                'proximo_cursor': codificar_cursor(filmes_pagina[-1]) if tem_mais else None
+            })
+
         return jsonify({
             'filmes': resultado,
-            'total': len(filmes),
+            'total': total,
             'page': page,
             'per_page': per_page,
-            'total_pages': (len(filmes) + per_page - 1) // per_page
+            'total_pages': (total + per_page - 1) // per_page
         })
 
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -173,9 +339,9 @@ def buscar_filme():
         if not termo:
             return jsonify({'error': 'Parâmetro "q" é obrigatório'}), 400
 
-        # Busca todos e filtra por substring
-        todos = s.avl.travessia_em_ordem(s.avl_root)
-        candidatos = [f for f in todos if termo.lower() in f.titulo.lower()]
+        # Índice de trigramas: só os títulos candidatos são conferidos
+        candidatos = s.buscar_filmes(termo)
+        total = len(candidatos)
 
         resultado = []
         for f in candidatos[:50]:  # Limita a 50 resultados
@@ -190,7 +356,7 @@ def buscar_filme():
 
         return jsonify({
             'filmes': resultado,
-            'total': len(candidatos),
+            'total': total,
             'termo_busca': termo
         })
 
@@ -198,6 +364,140 @@ def buscar_filme():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/filmes/autocompletar', methods=['GET'])
+def autocompletar_filme():
+    """Sugestões por prefixo do título (para a caixa de busca), melhores notas primeiro"""
+    try:
+        s = inicializar_sistema()
+        prefixo = request.args.get('q', '').strip()
+        limit = int(request.args.get('limit', 10))
+
+        if not prefixo:
+            return jsonify({'error': 'Parâmetro "q" é obrigatório'}), 400
+        if limit < 1:
+            raise ValueError('limit deve ser pelo menos 1')
+
+        sugestoes, total = s.autocompletar(prefixo, limit)
+
+        return jsonify({
+            'sugestoes': [
+                {'id': f.id, 'titulo': f.titulo, 'ano': f.ano, 'nota': f.nota}
+                for f in sugestoes
+            ],
+            'total': total,
+            'prefixo': prefixo
+        })
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def parametro_numerico(nome, tipo):
+    """Valor numérico de um query param opcional (None se ausente). Lança ValueError se inválido."""
+    valor = request.args.get(nome, '').strip()
+    if not valor:
+        return None
+    try:
+        return tipo(valor)
+    except ValueError:
+        raise ValueError(f'Parâmetro "{nome}" inválido: {valor}')
+
+
+@app.route('/api/filmes/consulta', methods=['GET'])
+def consultar_filmes():
+    """
+    Consulta por vários critérios, resolvida no servidor pelos índices ordenados
+    Query params (todos opcionais):
+    - ano_min/ano_max, nota_min/nota_max: faixas inclusivas
+    - generos: separados por vírgula; modo_generos=todos exige todos (padrão: qualquer um)
+    - prefixo: começo do título
+    - ordenar: nota (padrão), ano ou titulo
+    - limit: quantidade de filmes (padrão: 20)
+    """
+    try:
+        s = inicializar_sistema()
+        args = request.args
+
+        generos = [g.strip() for g in args.get('generos', '').split(',') if g.strip()]
+        modo_generos = args.get('modo_generos', 'qualquer')
+        if modo_generos not in ('qualquer', 'todos'):
+            return jsonify({'error': f'modo_generos desconhecido: {modo_generos}'}), 400
+
+        filmes, indice = s.consultar(
+            ano_min=parametro_numerico('ano_min', int),
+            ano_max=parametro_numerico('ano_max', int),
+            nota_min=parametro_numerico('nota_min', float),
+            nota_max=parametro_numerico('nota_max', float),
+            generos=generos,
+            todos_generos=modo_generos == 'todos',
+            prefixo=args.get('prefixo', '').strip() or None,
+            ordenar=args.get('ordenar', 'nota'),
+            limite=int(args.get('limit', 20))
+        )
+
+        return jsonify({
+            'filmes': [
+                {
+                    'id': f.id,
+                    'titulo': f.titulo,
+                    'ano': f.ano,
+                    'genero': f.genero,
+                    'nota': f.nota,
+                    'img': f'https://placehold.co/220x330/1e0730/a855f7?text={f.titulo[:15].replace(" ", "+")}'
+                }
+                for f in filmes
+            ],
+            'total': len(filmes),
+            'indice': indice
+        })
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def dados_filme(filme):
+    """Detalhes de um filme no formato de /api/filmes/<id>"""
+    return {
+        'id': filme.id,
+        'titulo': filme.titulo,
+        'ano': filme.ano,
+        'genero': filme.genero,
+        'nota': filme.nota,
+        'colecao': filme.colecao or None,
+        'img': f'https://placehold.co/220x330/1e0730/a855f7?text={filme.titulo[:15].replace(" ", "+")}'
+    }
+
+
+MAX_IDS_LOTE = 500
+
+
+def ids_pedidos():
+    """
+    IDs de um pedido em lote: ?ids=1,2,3 ou corpo JSON {"ids": [1, 2, 3]}, sem repetidos
+    e na ordem dada. Lança ValueError se faltarem, forem inválidos ou passarem do limite.
+    """
+    corpo = request.get_json(silent=True) if request.method == 'POST' else None
+    if corpo is not None:
+        brutos = corpo.get('ids') if isinstance(corpo, dict) else None
+        if not isinstance(brutos, list):
+            raise ValueError('Corpo deve ser {"ids": [...]}')
+    else:
+        brutos = [i for i in request.args.get('ids', '').split(',') if i.strip()]
+    if not brutos:
+        raise ValueError('Parâmetro "ids" é obrigatório')
+    if len(brutos) > MAX_IDS_LOTE:
+        raise ValueError(f'No máximo {MAX_IDS_LOTE} IDs por pedido')
+    # Só inteiros de verdade ou texto só com dígitos: int() aceitaria 1.7 e true do JSON
+    if not all((isinstance(i, int) and not isinstance(i, bool))
+               or (isinstance(i, str) and i.strip().isdecimal()) for i in brutos):
+        raise ValueError('IDs devem ser inteiros')
+    return list(dict.fromkeys(int(i) for i in brutos))
+
+
 @app.route('/api/filmes/<int:filme_id>', methods=['GET'])
 def detalhes_filme(filme_id):
     """Retorna detalhes de um filme específico"""
@@ -208,15 +508,30 @@ def detalhes_filme(filme_id):
         if not filme:
             return jsonify({'error': 'Filme não encontrado'}), 404
 
+        return jsonify(dados_filme(filme))
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/filmes/lote', methods=['GET', 'POST'])
+def detalhes_filmes_lote():
+    """
+    Detalhes de vários filmes num pedido só (ex.: a lista do usuário)
+    ?ids=1,2,3 ou POST {"ids": [...]}; os IDs inexistentes voltam em 'nao_encontrados'
+    """
+    try:
+        s = inicializar_sistema()
+        ids = ids_pedidos()
+
+        filmes = [s.mapa_id_filme.get(i) for i in ids]
         return jsonify({
-            'id': filme.id,
-            'titulo': filme.titulo,
-            'ano': filme.ano,
-            'genero': filme.genero,
-            'nota': filme.nota,
-            'img': f'https://placehold.co/220x330/1e0730/a855f7?text={filme.titulo[:15].replace(" ", "+")}'
+            'filmes': [dados_filme(f) for f in filmes if f],
+            'nao_encontrados': [i for i, f in zip(ids, filmes) if not f]
         })
 
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -226,24 +541,17 @@ def recomendacoes_geral():
     """
     Retorna recomendações gerais ou filtradas por gênero
     Query params:
-    - generos: filtra por gênero específico
+    - generos: filtra por gênero (vários separados por vírgula)
     - limit: quantidade de filmes (padrão: 20)
     """
     try:
         s = inicializar_sistema()
 
-        genero_filtro = request.args.get('generos', '').strip()
+        generos = [g for g in request.args.get('generos', '').split(',') if g.strip()]
         limit = int(request.args.get('limit', 20))
 
-        filmes = s.avl.travessia_em_ordem(s.avl_root)
-
-        # Filtra por gênero se especificado
-        if genero_filtro:
-            filmes = [f for f in filmes if genero_filtro.lower() in f.genero.lower()]
-
-        # Ordena por nota (melhores primeiro)
-        filmes.sort(key=lambda x: x.nota, reverse=True)
-        filmes = filmes[:limit]
+        # Listas por gênero já ordenadas por nota: lê só os `limit` primeiros
+        filmes = s.melhores_por_nota(generos, limit)
 
         resultado = []
         for f in filmes:
@@ -265,7 +573,8 @@ def recomendacoes_geral():
 @app.route('/api/recomendacoes/<int:filme_id>', methods=['GET'])
 def recomendar_similares(filme_id):
     """
-    Recomenda filmes similares usando o algoritmo BFS do grafo
+    Recomenda filmes similares: a franquia e depois a busca pela melhor primeiro no
+    grafo ponderado, servidas do cache de recomendações do sistema
     (Funcionalidade principal do seu sistema!)
     """
     try:
@@ -276,25 +585,22 @@ def recomendar_similares(filme_id):
         if not filme_base:
             return jsonify({'error': 'Filme não encontrado'}), 404
 
-        # 2. Executa o algoritmo de recomendação (BFS no grafo)
-        ids_recomendados = s.grafo_similaridade.bfs(filme_base.id)
+        # 2. Franquia e os mais similares (gêneros, nota e ano) com nota >= base
+        similares = s.recomendacoes(filme_base)
 
-        # 3. Busca dados completos dos filmes recomendados
+        # 3. Busca dados completos dos filmes recomendados (já em ordem de similaridade)
         recomendacoes = []
-        for id_filme in ids_recomendados:
-            filme = s.mapa_id_filme.get(id_filme)
-            if filme and filme.nota >= filme_base.nota:  # Filtro de qualidade
-                recomendacoes.append({
-                    'id': filme.id,
-                    'titulo': filme.titulo,
-                    'ano': filme.ano,
-                    'genero': filme.genero,
-                    'nota': filme.nota,
-                    'img': f'https://placehold.co/220x330/1e0730/a855f7?text={filme.titulo[:15].replace(" ", "+")}'
-                })
-
-        # 4. Ordena por nota
-        recomendacoes.sort(key=lambda x: x['nota'], reverse=True)
+        for filme, motivo, similaridade in similares:
+            recomendacoes.append({
+                'id': filme.id,
+                'titulo': filme.titulo,
+                'ano': filme.ano,
+                'genero': filme.genero,
+                'nota': filme.nota,
+                'motivo': motivo,
+                'similaridade': None if similaridade is None else round(similaridade, 4),
+                'img': f'https://placehold.co/220x330/1e0730/a855f7?text={filme.titulo[:15].replace(" ", "+")}'
+            })
 
         return jsonify({
             'filme_base': {
@@ -310,23 +616,96 @@ def recomendar_similares(filme_id):
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/recomendacoes/lote', methods=['GET', 'POST'])
+def recomendar_lote():
+    """
+    Recomendações combinadas de vários filmes num pedido só, sem repetidos e sem os
+    próprios filmes: as franquias de cada um e uma busca única no grafo a partir de todos
+    ?ids=1,2,3 ou POST {"ids": [...]}; limit: quantidade (padrão: 20)
+    """
+    try:
+        s = inicializar_sistema()
+        ids = ids_pedidos()
+        limit = int(request.args.get('limit', 20))
+        if limit < 1:
+            raise ValueError('limit deve ser pelo menos 1')
+
+        filmes_base = [s.mapa_id_filme[i] for i in ids if i in s.mapa_id_filme]
+        similares = s.recomendar_para_varios(filmes_base, limite=limit)
+
+        recomendacoes = []
+        for filme, motivo, similaridade in similares[:limit]:
+            dados = dados_filme(filme)
+            dados['motivo'] = motivo
+            dados['similaridade'] = None if similaridade is None else round(similaridade, 4)
+            recomendacoes.append(dados)
+
+        return jsonify({
+            'filmes_base': [f.id for f in filmes_base],
+            'nao_encontrados': [i for i in ids if i not in s.mapa_id_filme],
+            'recomendacoes': recomendacoes,
+            'total': len(similares)
+        })
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+MAX_PROFUNDIDADE_PERSONALIZADAS = 3
+
+
+@app.route('/api/recomendacoes/personalizadas', methods=['GET', 'POST'])
+def recomendar_personalizadas():
+    """
+    Recomendações para a lista do usuário: uma travessia do grafo a partir de todos os
+    filmes dela, pontuando cada filme por quantos da lista o alcançam e a que distância
+    ?ids=1,2,3 ou POST {"ids": [...]}; limit (padrão: 20); profundidade em saltos (padrão: 2)
+    """
+    try:
+        s = inicializar_sistema()
+        ids = ids_pedidos()
+        limit = int(request.args.get('limit', 20))
+        if limit < 1:
+            raise ValueError('limit deve ser pelo menos 1')
+        profundidade = int(request.args.get('profundidade', 2))
+        if not 1 <= profundidade <= MAX_PROFUNDIDADE_PERSONALIZADAS:
+            raise ValueError(f'profundidade deve estar entre 1 e {MAX_PROFUNDIDADE_PERSONALIZADAS}')
+
+        filmes_base = [s.mapa_id_filme[i] for i in ids if i in s.mapa_id_filme]
+        recomendados = s.recomendar_para_lista(filmes_base, limite=limit, profundidade=profundidade)
+
+        recomendacoes = []
+        for filme, pontuacao, sementes in recomendados:
+            dados = dados_filme(filme)
+            dados['pontuacao'] = round(pontuacao, 4)
+            dados['filmes_da_lista'] = sementes
+            recomendacoes.append(dados)
+
+        return jsonify({
+            'filmes_base': [f.id for f in filmes_base],
+            'nao_encontrados': [i for i in ids if i not in s.mapa_id_filme],
+            'recomendacoes': recomendacoes,
+            'total': len(recomendacoes)
+        })
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/generos', methods=['GET'])
+@resposta_em_cache()
 def listar_generos():
     """Lista todos os gêneros únicos disponíveis"""
     try:
         s = inicializar_sistema()
-        filmes = s.avl.travessia_em_ordem(s.avl_root)
-
-        generos = set()
-        for f in filmes:
-            # Separa gêneros compostos (ex: "Action|Adventure")
-            for g in f.genero.split('|'):
-                g = g.strip()
-                if g:
-                    generos.add(g)
+        generos = s.listar_generos()
 
         return jsonify({
-            'generos': sorted(list(generos)),
+            'generos': generos,
             'total': len(generos)
         })
 
@@ -335,62 +714,124 @@ def listar_generos():
 
 
 @app.route('/api/estatisticas', methods=['GET'])
+@resposta_em_cache()
 def estatisticas():
     """Retorna estatísticas do catálogo"""
     try:
         s = inicializar_sistema()
-        filmes = s.avl.travessia_em_ordem(s.avl_root)
+        notas = [f.nota for f in s.avl.iterar_em_ordem(s.avl_root)]
 
-        if not filmes:
+        if not notas:
             return jsonify({'error': 'Nenhum filme carregado'}), 500
 
-        notas = [f.nota for f in filmes]
-
         return jsonify({
-            'total_filmes': len(filmes),
+            'total_filmes': len(notas),
             'nota_media': sum(notas) / len(notas),
             'nota_maxima': max(notas),
             'nota_minima': min(notas),
-            'total_conexoes_grafo': sum(len(vizinhos) for vizinhos in s.grafo_similaridade.adj.values()) // 2
+            'total_conexoes_grafo': s.grafo_similaridade.total_arestas()
         })
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     
+# Campos que o catálogo sabe projetar (?fields=id,titulo,nota)
+CAMPOS_CATALOGO = {
+    'id': lambda f: f.id,
+    'titulo': lambda f: f.titulo,
+    'ano': lambda f: f.ano,
+    'genero': lambda f: f.genero,
+    'nota': lambda f: f.nota,
+    'colecao': lambda f: f.colecao or None,
+    'img': lambda f: getattr(f, 'img', f'https://placehold.co/220x330/1e0730/a855f7?text={f.titulo[:15].replace(" ", "+")}'),
+    'overview': lambda f: getattr(f, 'overview', "Sem sinopse."),
+}
+CAMPOS_CATALOGO_PADRAO = ['id', 'titulo', 'ano', 'genero', 'nota', 'img', 'overview']
+FILMES_POR_BLOCO = 256  # filmes por pedaço enviado no modo streaming
+
+codificador_json = json.JSONEncoder(ensure_ascii=True, sort_keys=True, separators=(',', ':'))
+
+
+def campos_pedidos():
+    """Lista de campos do parâmetro fields= (padrão se ausente). Lança ValueError se desconhecido."""
+    campos = [c.strip() for c in request.args.get('fields', '').split(',') if c.strip()]
+    desconhecidos = [c for c in campos if c not in CAMPOS_CATALOGO]
+    if desconhecidos:
+        raise ValueError(f"Campos desconhecidos: {', '.join(desconhecidos)}")
+    return campos or CAMPOS_CATALOGO_PADRAO
+
+
+def gerar_catalogo(s, campos, ndjson):
+    """
+    Percorre a AVL sob demanda e gera o catálogo em pedaços de FILMES_POR_BLOCO filmes:
+    uma linha JSON por filme (NDJSON) ou um array JSON. Memória constante por pedido.
+    """
+    extratores = [(c, CAMPOS_CATALOGO[c]) for c in campos]
+    separador = '\n' if ndjson else ','
+    primeiro = True
+    if not ndjson:
+        yield '['
+    bloco = []
+    for f in s.avl.iterar_em_ordem(s.avl_root):
+        bloco.append(codificador_json.encode({c: extrair(f) for c, extrair in extratores}))
+        if len(bloco) == FILMES_POR_BLOCO:
+            yield ('' if primeiro or ndjson else ',') + separador.join(bloco) + ('\n' if ndjson else '')
+            primeiro = False
+            bloco = []
+    if bloco:
+        yield ('' if primeiro or ndjson else ',') + separador.join(bloco) + ('\n' if ndjson else '')
+    if not ndjson:
+        yield ']'
+
+
 @app.route('/api/catalogo', methods=['GET'])
+@resposta_em_cache('fields', 'formato')
 def catalogo_completo():
-    """Retorna TODOS os filmes do CSV sem limite"""
+    """
+    Retorna TODOS os filmes do CSV sem limite
+    Query params:
+    - fields: campos de cada filme, separados por vírgula (padrão: todos menos colecao)
+    - formato: 'ndjson' (um filme por linha) ou 'stream' (array JSON), ambos em
+      streaming sem montar a lista inteira; sem ele, um JSON só (guardado em cache)
+    """
     try:
         s = inicializar_sistema()
-        filmes = s.avl.travessia_em_ordem(s.avl_root)
+        campos = campos_pedidos()
+        formato = request.args.get('formato')
 
-        resultado = []
-        for f in filmes:
-            resultado.append({
-                'id': f.id,
-                'titulo': f.titulo,
-                'ano': f.ano,
-                'genero': f.genero,
-                'nota': f.nota,
-                'img': getattr(f, 'img', f'https://placehold.co/220x330/1e0730/a855f7?text={f.titulo[:15].replace(" ", "+")}'),
-                'overview': getattr(f, 'overview', "Sem sinopse."),
-            })
+        if formato in ('ndjson', 'stream'):
+            ndjson = formato == 'ndjson'
+            return Response(gerar_catalogo(s, campos, ndjson),
+                            mimetype='application/x-ndjson' if ndjson else 'application/json')
+        if formato is not None:
+            return jsonify({'error': f'Formato desconhecido: {formato}'}), 400
 
-        return jsonify(resultado)
+        return Response(''.join(gerar_catalogo(s, campos, False)), mimetype='application/json')
 
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 # ==================== EXECUÇÃO ====================
 
 if __name__ == '__main__':
+    dados = ARQUIVO_DADOS
+
+    # Job offline (fora da subida do servidor): calcula as recomendações de todo o
+    # catálogo e grava ao lado do CSV; as próximas inicializações as carregam prontas
+    if '--precomputar' in sys.argv:
+        sistema_carregado = inicializar_sistema(dados)
+        total = sistema_carregado.precomputar_recomendacoes()
+        sistema_carregado.salvar_recomendacoes()
+        print(f"⚡ Recomendações pré-calculadas para {total} filmes ({sistema_carregado.arquivo_recomendacoes})")
+        sys.exit(0)
+
     print("🎬 PopScreen API - Sistema de Recomendação de Filmes")
     print("📊 Estruturas: AVL Tree + Graph (BFS)")
     print("🚀 Iniciando servidor Flask...")
     print("-" * 50)
 
-    dados = ARQUIVO_DADOS
-
     # Pré-carrega o sistema
     inicializar_sistema(dados)
 
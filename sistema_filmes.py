@@ -1,7 +1,22 @@
 import csv
+import mmap
+import os
+import re
+import struct
 import sys
-from collections import deque
+import threading
+import time
+import unicodedata
+import zlib
+import bisect
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice, repeat
 import difflib
+import math
+import heapq
+from operator import add
 
 # imagens 
 def create_poster_placeholder(title):
@@ -35,45 +50,117 @@ GENRE_MAP_PT = {
 
 # --- DEFINIÇÃO DAS ESTRUTURAS DE DADOS ---
 
+def normalizar_titulo(texto):
+    """
+    Chave de comparação de títulos: sem acentos, casefold e espaços colapsados.
+    "  Amélie " e "AMELIE" viram "amelie". Calculada uma vez por filme.
+    """
+    decomposto = unicodedata.normalize('NFKD', texto)
+    sem_acentos = ''.join(c for c in decomposto if not unicodedata.combining(c))
+    return ' '.join(sem_acentos.casefold().split())
+
+
+class RegistroGeneros:
+    """
+    Atribui um bit a cada gênero na primeira vez que ele aparece.
+    Os filmes guardam só a máscara (int); o texto "Ação|Fantasia" é montado
+    sob demanda e fica em cache por máscara (há poucas combinações distintas).
+    """
+
+    def __init__(self):
+        self.nomes = []   # bit -> nome
+        self.bits = {}    # nome -> bit
+        self._bits_minusculo = {}
+        self._textos = {}
+        self._bits_mascara = {}
+
+    def bit(self, nome):
+        if nome not in self.bits:
+            self.bits[nome] = len(self.nomes)
+            self._bits_minusculo[nome.lower()] = len(self.nomes)
+            self.nomes.append(nome)
+        return self.bits[nome]
+
+    def bit_por_nome(self, nome):
+        """Bit do gênero pelo nome exato (sem diferenciar maiúsculas; aceita o nome em inglês) ou None."""
+        nome = nome.strip()
+        return self._bits_minusculo.get(GENRE_MAP_PT.get(nome, nome).lower())
+
+    def bits_da_mascara(self, mascara):
+        bits = self._bits_mascara.get(mascara)
+        if bits is None:
+            bits = self._bits_mascara[mascara] = tuple(i for i in range(len(self.nomes)) if mascara >> i & 1)
+        return bits
+
+    def mascara(self, nomes):
+        mascara = 0
+        for nome in nomes:
+            mascara |= 1 << self.bit(nome)
+        return mascara
+
+    def nomes_da_mascara(self, mascara):
+        return [nome for i, nome in enumerate(self.nomes) if mascara >> i & 1]
+
+    def texto(self, mascara):
+        texto = self._textos.get(mascara)
+        if texto is None:
+            texto = self._textos[mascara] = "|".join(self.nomes_da_mascara(mascara))
+        return texto
+
+
+REGISTRO_GENEROS = RegistroGeneros()
+
+
 class Filme:
     """Classe para armazenar os dados de um filme."""
 
-    def __init__(self, id, titulo, ano, genero, nota, img=None):
+    __slots__ = ('id', 'titulo', 'chave', 'ano', 'nota', 'mascara_generos', 'colecao_id', 'colecao', '_img')
+
+    def __init__(self, id, titulo, ano, genero, nota, img=None, colecao_id=0, colecao=""):
         self.id = int(id)
         self.titulo = str(titulo)
+        # Coleção/franquia do TMDB (belongs_to_collection); 0 = filme avulso
+        self.colecao_id = int(colecao_id or 0)
+        self.colecao = str(colecao or "") if self.colecao_id else ""
+        self.chave = normalizar_titulo(self.titulo)  # usada pela AVL, índices e duplicidade
         try:
             self.ano = int(str(ano)[:4])  # ano = primeiros 4 dígitos
         except:
             self.ano = 0
-        # Normaliza e traduz gêneros caso estejam em inglês (aceita '|' como separador)
-        if isinstance(genero, str):
-            # separa por pipe ou vírgula
-            parts = [g.strip() for g in genero.replace(',', '|').split('|') if g.strip()]
-            parts_pt = []
-            for p in parts:
-                parts_pt.append(GENRE_MAP_PT.get(p, p))  # traduz se houver
-            self.genero = "|".join(parts_pt)
-        else:
-            self.genero = str(genero)
+        # Normaliza e traduz gêneros caso estejam em inglês (aceita '|' ou ',' como separador)
+        parts = [g.strip() for g in str(genero).replace(',', '|').split('|') if g.strip()]
+        self.mascara_generos = REGISTRO_GENEROS.mascara(GENRE_MAP_PT.get(p, p) for p in parts)
 
         try:
             self.nota = float(nota)
         except:
             self.nota = 0.0
 
-        # imagem (url). Se não fornecida, gera placeholder
-        self.img = img or create_poster_placeholder(self.titulo)
+        # imagem (url). Se não fornecida, o placeholder é gerado ao ler `img`
+        self._img = img
+
+    @property
+    def genero(self):
+        """Gêneros no formato "Ação|Fantasia"."""
+        return REGISTRO_GENEROS.texto(self.mascara_generos)
+
+    @property
+    def img(self):
+        return self._img or create_poster_placeholder(self.titulo)
 
 
 class NoAVL:
     """Nó da Árvore AVL."""
 
+    __slots__ = ('filme', 'chave', 'esquerda', 'direita', 'altura', 'tamanho')
+
     def __init__(self, filme):
         self.filme = filme
-        self.chave = filme.titulo.lower().strip()
+        self.chave = filme.chave
         self.esquerda = None
         self.direita = None
         self.altura = 1
+        self.tamanho = 1  # nós na subárvore (estatística de ordem)
 
 
 class ArvoreAVL:
@@ -83,6 +170,15 @@ class ArvoreAVL:
         if not no: return 0
         return no.altura
 
+    def _get_tamanho(self, no):
+        if not no: return 0
+        return no.tamanho
+
+    def _atualizar(self, no):
+        """Recalcula altura e tamanho do nó a partir dos filhos."""
+        no.altura = 1 + max(self._get_altura(no.esquerda), self._get_altura(no.direita))
+        no.tamanho = 1 + self._get_tamanho(no.esquerda) + self._get_tamanho(no.direita)
+
     def _get_balanco(self, no):
         if not no: return 0
         return self._get_altura(no.esquerda) - self._get_altura(no.direita)
@@ -92,8 +188,8 @@ class ArvoreAVL:
         T3 = y.direita
         y.direita = z
         z.esquerda = T3
-        z.altura = 1 + max(self._get_altura(z.esquerda), self._get_altura(z.direita))
-        y.altura = 1 + max(self._get_altura(y.esquerda), self._get_altura(y.direita))
+        self._atualizar(z)
+        self._atualizar(y)
         return y
 
     def _rotacao_esquerda(self, y):
@@ -101,15 +197,15 @@ class ArvoreAVL:
         T2 = x.esquerda
         x.esquerda = y
         y.direita = T2
-        y.altura = 1 + max(self._get_altura(y.esquerda), self._get_altura(y.direita))
-        x.altura = 1 + max(self._get_altura(x.esquerda), self._get_altura(x.direita))
+        self._atualizar(y)
+        self._atualizar(x)
         return x
 
     def inserir(self, root, filme):
         if not root:
             return NoAVL(filme)
 
-        chave_nova = filme.titulo.lower().strip()
+        chave_nova = filme.chave
 
         if chave_nova < root.chave:
             root.esquerda = self.inserir(root.esquerda, filme)
@@ -118,7 +214,7 @@ class ArvoreAVL:
         else:
             return root  # Duplicado
 
-        root.altura = 1 + max(self._get_altura(root.esquerda), self._get_altura(root.direita))
+        self._atualizar(root)
         balanco = self._get_balanco(root)
 
         if balanco > 1 and self._get_balanco(root.esquerda) >= 0:
@@ -140,16 +236,18 @@ class ArvoreAVL:
         return self._get_no_minimo(root.esquerda)
 
     def remover(self, root, titulo):
+        return self._remover(root, normalizar_titulo(titulo))
+
+    def _remover(self, root, chave):
         if not root:
             return root, None
 
-        titulo_lower = titulo.lower().strip()
         filme_removido = None
 
-        if titulo_lower < root.chave:
-            root.esquerda, filme_removido = self.remover(root.esquerda, titulo)
-        elif titulo_lower > root.chave:
-            root.direita, filme_removido = self.remover(root.direita, titulo)
+        if chave < root.chave:
+            root.esquerda, filme_removido = self._remover(root.esquerda, chave)
+        elif chave > root.chave:
+            root.direita, filme_removido = self._remover(root.direita, chave)
         else:
             filme_removido = root.filme
             if root.esquerda is None:
@@ -164,12 +262,12 @@ class ArvoreAVL:
             temp = self._get_no_minimo(root.direita)
             root.filme = temp.filme
             root.chave = temp.chave
-            root.direita, _ = self.remover(root.direita, temp.chave)
+            root.direita, _ = self._remover(root.direita, temp.chave)
 
         if root is None:
             return root, filme_removido
 
-        root.altura = 1 + max(self._get_altura(root.esquerda), self._get_altura(root.direita))
+        self._atualizar(root)
         balanco = self._get_balanco(root)
 
         if balanco > 1 and self._get_balanco(root.esquerda) >= 0:
@@ -186,67 +284,979 @@ class ArvoreAVL:
         return root, filme_removido
 
     def buscar_exato(self, root, titulo):
-        """Busca binária exata por título."""
-        if not root:
+        """Busca binária exata por título (chave normalizada)."""
+        chave = normalizar_titulo(titulo)
+        no = root
+        while no:
+            if chave < no.chave:
+                no = no.esquerda
+            elif chave > no.chave:
+                no = no.direita
+            else:
+                return no.filme
+        return None
+
+    def construir(self, filmes):
+        """
+        Monta uma AVL perfeitamente balanceada com todos os filmes de uma vez:
+        uma ordenação pela chave + montagem linear (O(n) após o sort).
+        Títulos repetidos seguem a regra de inserir(): fica o primeiro da lista.
+        """
+        nos = []
+        for filme in sorted(filmes, key=lambda f: f.chave):  # estável: o primeiro de cada título vem antes
+            if nos and nos[-1].chave == filme.chave:
+                continue
+            nos.append(NoAVL(filme))
+        return self._montar_balanceada(nos, 0, len(nos))
+
+    def _montar_balanceada(self, nos, inicio, fim):
+        if inicio >= fim:
             return None
-        titulo_lower = titulo.lower().strip()
-        if titulo_lower < root.chave:
-            return self.buscar_exato(root.esquerda, titulo)
-        elif titulo_lower > root.chave:
-            return self.buscar_exato(root.direita, titulo)
+        meio = (inicio + fim) // 2
+        no = nos[meio]
+        no.esquerda = self._montar_balanceada(nos, inicio, meio)
+        no.direita = self._montar_balanceada(nos, meio + 1, fim)
+        self._atualizar(no)
+        return no
+
+    def tamanho(self, root):
+        """Quantidade de filmes na árvore (O(1))."""
+        return self._get_tamanho(root)
+
+    def posto(self, root, titulo, incluir_igual=False):
+        """
+        Quantos títulos da árvore são menores que `titulo` (O(log n)).
+        Com incluir_igual, conta também o próprio título, se estiver na árvore.
+        """
+        chave = normalizar_titulo(titulo)
+        menores = 0
+        no = root
+        while no:
+            if no.chave < chave or (incluir_igual and no.chave == chave):
+                menores += self._get_tamanho(no.esquerda) + 1
+                no = no.direita
+            else:
+                no = no.esquerda
+        return menores
+
+    def selecionar(self, root, k):
+        """Filme na posição k (0-based) da ordem de título, ou None (O(log n))."""
+        no = root
+        while no:
+            tam_esq = self._get_tamanho(no.esquerda)
+            if k < tam_esq:
+                no = no.esquerda
+            elif k == tam_esq:
+                return no.filme
+            else:
+                k -= tam_esq + 1
+                no = no.direita
+        return None
+
+    def iterar_em_ordem(self, root, inicio=None, fim=None, offset=0, limite=None, apos=None):
+        """Gera os filmes em ordem de título no intervalo [inicio, fim) ou após `apos`, com offset/limite."""
+        chave_fim = normalizar_titulo(fim) if fim is not None else None
+        offset = max(offset, 0)
+        if apos is not None:
+            k = self.posto(root, apos, incluir_igual=True) + offset
         else:
-            return root.filme
+            k = (self.posto(root, inicio) if inicio is not None else 0) + offset
+
+        # Desce até o nó de posição k, empilhando os ancestrais que vêm depois dele
+        pilha = []
+        no = root
+        while no:
+            tam_esq = self._get_tamanho(no.esquerda)
+            if k < tam_esq:
+                pilha.append(no)
+                no = no.esquerda
+            elif k == tam_esq:
+                pilha.append(no)
+                break
+            else:
+                k -= tam_esq + 1
+                no = no.direita
+
+        entregues = 0
+        while pilha and (limite is None or entregues < limite):
+            no = pilha.pop()
+            if chave_fim is not None and no.chave >= chave_fim:
+                return
+            entregues += 1
+            yield no.filme
+
+            no = no.direita
+            while no:
+                pilha.append(no)
+                no = no.esquerda
 
     def travessia_em_ordem(self, root):
-        filmes = []
-        if root:
-            filmes.extend(self.travessia_em_ordem(root.esquerda))
-            filmes.append(root.filme)
-            filmes.extend(self.travessia_em_ordem(root.direita))
-        return filmes
+        return list(self.iterar_em_ordem(root))
+
+
+class IndiceTrigramas:
+    """
+    Índice invertido de trigramas dos títulos (normalizados) para busca por substring.
+    A busca intersecta as listas dos trigramas do termo, da menor para a maior,
+    e confirma só os candidatos que sobraram. Termos com menos de 3 letras
+    não têm trigrama e caem na varredura dos títulos.
+    Recebe as chaves já normalizadas (Filme.chave) e as lê de `filmes` (id -> Filme).
+    """
+
+    def __init__(self, filmes):
+        self.filmes = filmes  # id -> Filme (o mapa do sistema; não guarda cópia dos títulos)
+        self.postings = {}    # trigrama -> {id, ...}
+        self.ids = set()      # IDs indexados
+
+    @staticmethod
+    def _trigramas(texto):
+        return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+    def adicionar(self, id_filme, chave):
+        self.ids.add(id_filme)
+        for tri in self._trigramas(chave):
+            self.postings.setdefault(tri, set()).add(id_filme)
+
+    def remover(self, id_filme, chave):
+        if id_filme not in self.ids:
+            return
+        self.ids.discard(id_filme)
+        for tri in self._trigramas(chave):
+            ids = self.postings.get(tri)
+            if ids is not None:
+                ids.discard(id_filme)
+                if not ids:
+                    del self.postings[tri]
+
+    def buscar(self, termo):
+        """IDs cujo título normalizado contém o termo normalizado (ignora acentos e caixa)."""
+        return self.buscar_chave(normalizar_titulo(termo))
+
+    def buscar_chave(self, termo):
+        """Como buscar, com o termo já normalizado."""
+        trigramas = self._trigramas(termo)
+        if not trigramas:
+            return [i for i in self.ids if termo in self.filmes[i].chave]
+
+        listas = []
+        for tri in trigramas:
+            ids = self.postings.get(tri)
+            if not ids:
+                return []
+            listas.append(ids)
+        listas.sort(key=len)
+
+        candidatos = set(listas[0])
+        for ids in listas[1:]:
+            candidatos &= ids
+            if not candidatos:
+                return []
+        return [i for i in candidatos if termo in self.filmes[i].chave]
+
+
+class IndiceSimilaridadeTitulos:
+    """
+    Acha títulos parecidos sem comparar com o catálogo inteiro.
+    Cada título vira uma assinatura MinHash dos seus bigramas de caracteres;
+    a assinatura é cortada em bandas e títulos que coincidem em alguma banda
+    são candidatos (LSH). Os títulos que contêm o título base vêm do índice
+    de trigramas. A confirmação usa a mesma regra exata de antes:
+    difflib ratio >= limiar ou título base contido no outro.
+    """
+
+    NUM_HASHES = 30
+    LINHAS_POR_BANDA = 2
+    _PRIMO = (1 << 61) - 1
+    # Funções hash h_i(x) = (a_i * x + b_i) mod primo, fixas para a assinatura ser reprodutível
+    _COEFICIENTES = [((i * 0x9E3779B97F4A7C15 + 1) % ((1 << 61) - 1) | 1,
+                      (i * 0xC2B2AE3D27D4EB4F + 7) % ((1 << 61) - 1)) for i in range(NUM_HASHES)]
+
+    # bigrama -> vetor com os NUM_HASHES hashes dele; o alfabeto dos títulos é pequeno,
+    # então cada bigrama é calculado uma vez e a assinatura vira um mínimo por coluna
+    _vetores_bigramas = {}
+
+    def __init__(self, indice_trigramas):
+        self.indice_trigramas = indice_trigramas
+        self.filmes = indice_trigramas.filmes  # id -> Filme
+        self.assinaturas = {}  # id -> tupla de chaves de banda
+        self.baldes = {}       # (banda, valores) -> {id, ...}
+
+    @classmethod
+    def _vetor_bigrama(cls, bigrama):
+        vetor = cls._vetores_bigramas.get(bigrama)
+        if vetor is None:
+            h = zlib.crc32(bigrama.encode('utf-8'))
+            vetor = cls._vetores_bigramas[bigrama] = tuple(
+                (a * h + b) % cls._PRIMO for a, b in cls._COEFICIENTES)
+        return vetor
+
+    def _bandas(self, chave):
+        texto = " " + chave + " "
+        vetores = [self._vetor_bigrama(bg) for bg in {texto[i:i + 2] for i in range(len(texto) - 1)}]
+        assinatura = [min(coluna) for coluna in zip(*vetores)]
+        r = self.LINHAS_POR_BANDA
+        return tuple((i, tuple(assinatura[i:i + r])) for i in range(0, self.NUM_HASHES, r))
+
+    def adicionar(self, id_filme, chave):
+        bandas = self._bandas(chave)
+        self.assinaturas[id_filme] = bandas
+        for banda in bandas:
+            self.baldes.setdefault(banda, set()).add(id_filme)
+
+    def remover(self, id_filme):
+        for banda in self.assinaturas.pop(id_filme, ()):
+            balde = self.baldes.get(banda)
+            if balde is not None:
+                balde.discard(id_filme)
+                if not balde:
+                    del self.baldes[banda]
+
+    def similares(self, titulo, chave, limiar=0.8):
+        """IDs cujo título tem ratio >= limiar com `titulo` ou o contém (candidatos via LSH + trigramas)."""
+        base = titulo.lower()
+        candidatos = set(self.indice_trigramas.buscar_chave(chave))
+        for banda in self._bandas(chave):
+            candidatos |= self.baldes.get(banda, set())
+
+        return [id_filme for id_filme in candidatos if id_filme in self.assinaturas
+                and titulos_parecidos(base, self.filmes[id_filme].titulo.lower(), limiar)]
+
+
+def titulos_parecidos(base, outro, limiar=0.8):
+    """Regra de similaridade de títulos (já em minúsculas): `outro` contém `base` ou ratio >= limiar."""
+    if base in outro:
+        return True
+    comparador = difflib.SequenceMatcher(None, base, outro)
+    # real_quick_ratio/quick_ratio são limites superiores baratos do ratio
+    return (comparador.real_quick_ratio() >= limiar and comparador.quick_ratio() >= limiar
+            and comparador.ratio() >= limiar)
+
+
+# Regra de ligação do grafo: cada filme se liga aos JANELA_VIZINHOS seguintes do mesmo
+# gênero (em ordem de nota) cuja nota difere em no máximo LIMITE_DIFERENCA_NOTA
+LIMITE_DIFERENCA_NOTA = 1.0
+JANELA_VIZINHOS = 10
+
+# Composição do peso (similaridade, de 0 a 1) de uma aresta do grafo
+PESO_GENEROS = 0.5  # Jaccard dos gêneros
+PESO_NOTA = 0.3     # 1 / (1 + diferença de nota)
+PESO_ANO = 0.2      # 1 / (1 + diferença de anos / 10); 0 se algum ano for desconhecido
+
+# Recomendação a partir de várias sementes: cada salto a mais vale esta fração do anterior
+DECAIMENTO_DISTANCIA = 0.5
 
 
 class Grafo:
-    """Implementação de Grafo (Lista de Adjacência)."""
+    """Grafo ponderado em CSR, com as alterações pendentes em extras/removidos até compactar()."""
 
     def __init__(self):
-        self.adj = {}
-
-    def adicionar_vertice(self, id_filme):
-        if id_filme not in self.adj:
-            self.adj[id_filme] = set()
+        self.ids = array('i')            # índice denso -> id do filme
+        self.mascaras = []               # índice denso -> máscara de gêneros (int: sem limite de 64 gêneros)
+        self.notas = array('d')
+        self.anos = array('i')
+        self.indice = {}                 # id do filme -> índice denso
+        self.offsets = array('I', [0])   # só cobre os vértices já compactados
+        self.adjacentes = array('i')
+        self.extras = {}                 # índice denso -> {índices densos} (arestas novas)
+        self.removidos = set()           # índices densos de vértices removidos
+        self.num_arestas = 0
+        self.arestas_extras = 0          # quantas das arestas estão em extras
+
+    def __contains__(self, id_filme):
+        return id_filme in self.indice
+
+    def __len__(self):
+        return len(self.indice)
+
+    def adicionar_vertice(self, id_filme, mascara_generos=0, nota=0.0, ano=0):
+        if id_filme not in self.indice:
+            self.indice[id_filme] = len(self.ids)
+            self.ids.append(id_filme)
+            self.mascaras.append(mascara_generos)
+            self.notas.append(nota)
+            self.anos.append(ano)
+            self._compactar_se_preciso()
 
     def adicionar_aresta(self, id_filme1, id_filme2):
-        if id_filme1 in self.adj and id_filme2 in self.adj:
-            self.adj[id_filme1].add(id_filme2)
-            self.adj[id_filme2].add(id_filme1)
+        i, j = self.indice.get(id_filme1), self.indice.get(id_filme2)
+        if i is None or j is None or i == j or self._tem_aresta(i, j):
+            return
+        self.extras.setdefault(i, set()).add(j)
+        self.extras.setdefault(j, set()).add(i)
+        self.num_arestas += 1
+        self.arestas_extras += 1
 
     def remover_vertice(self, id_filme):
-        if id_filme in self.adj:
-            for vizinho in self.adj[id_filme]:
-                if vizinho in self.adj:
-                    self.adj[vizinho].discard(id_filme)
-            del self.adj[id_filme]
+        i = self.indice.pop(id_filme, None)
+        if i is None:
+            return
+        for j in self._vizinhos_densos(i):
+            if i in self.extras.get(j, ()):
+                self.extras[j].discard(i)
+                self.arestas_extras -= 1
+            self.num_arestas -= 1
+        self.extras.pop(i, None)
+        self.removidos.add(i)  # as linhas do CSR que apontam para i passam a ignorá-lo
+        self._compactar_se_preciso()
+
+    def total_arestas(self):
+        return self.num_arestas
+
+    def vizinhos(self, id_filme):
+        """IDs dos vizinhos de um filme (vazio se não estiver no grafo)."""
+        i = self.indice.get(id_filme)
+        if i is None:
+            return []
+        ids = self.ids
+        return [ids[j] for j in self._vizinhos_densos(i)]
+
+    def peso(self, id_filme1, id_filme2):
+        """Similaridade (0 a 1) entre dois filmes do grafo, pela fórmula das arestas."""
+        return self._peso(self.indice[id_filme1], self.indice[id_filme2])
+
+    def _peso(self, i, j):
+        a, b = self.mascaras[i], self.mascaras[j]
+        uniao = (a | b).bit_count()
+        generos = (a & b).bit_count() / uniao if uniao else 0.0
+        nota = 1.0 / (1.0 + abs(self.notas[i] - self.notas[j]))
+        ano_i, ano_j = self.anos[i], self.anos[j]
+        ano = 1.0 / (1.0 + abs(ano_i - ano_j) / 10.0) if ano_i and ano_j else 0.0
+        return PESO_GENEROS * generos + PESO_NOTA * nota + PESO_ANO * ano
+
+    def _tem_aresta(self, i, j):
+        if j in self.extras.get(i, ()):
+            return True
+        if i + 1 < len(self.offsets):
+            inicio, fim = self.offsets[i], self.offsets[i + 1]
+            k = bisect.bisect_left(self.adjacentes, j, inicio, fim)
+            return k < fim and self.adjacentes[k] == j and j not in self.removidos
+        return False
+
+    def _vizinhos_densos(self, i):
+        if i + 1 < len(self.offsets):
+            linha = self.adjacentes[self.offsets[i]:self.offsets[i + 1]]
+            if self.removidos:
+                linha = [j for j in linha if j not in self.removidos]
+        else:
+            linha = ()
+        extras = self.extras.get(i)
+        return linha if not extras else list(linha) + sorted(extras)
+
+    def _compactar_se_preciso(self):
+        # A camada mutável é pequena por construção; se crescer, vira CSR de novo
+        if (len(self.removidos) > max(1024, len(self.indice) // 8)
+                or self.arestas_extras > max(8192, self.num_arestas // 8)):
+            self.compactar()
+
+    def definir_csr(self, offsets, adjacentes):
+        """
+        Adota um CSR pronto (ex.: lido do snapshot), com linhas ordenadas e simétricas,
+        indexado na ordem em que os vértices foram adicionados.
+        """
+        self.offsets = offsets
+        self.adjacentes = adjacentes
+        self.extras = {}
+        self.removidos = set()
+        self.num_arestas = len(adjacentes) // 2
+        self.arestas_extras = 0
+
+    def compactar(self, linhas=None):
+        """
+        Reconstrói o CSR com as arestas atuais (CSR + camada mutável), descartando
+        vértices removidos. `linhas` (opcional, carga em lote) traz vizinhos extras
+        por índice denso, simétricos e possivelmente repetidos.
+        """
+        vivos = [i for i in range(len(self.ids)) if i not in self.removidos]
+        novo = array('i', [-1]) * len(self.ids)
+        for k, i in enumerate(vivos):
+            novo[i] = k
+
+        offsets, adjacentes = array('I', [0]), []
+        for i in vivos:
+            linha = set(linhas[i]) if linhas is not None else set()
+            linha.update(self._vizinhos_densos(i))
+            if self.removidos:
+                linha = [novo[j] for j in linha if novo[j] >= 0]
+            adjacentes.extend(sorted(linha))
+            offsets.append(len(adjacentes))
+        adjacentes = array('i', adjacentes)
+
+        self.ids = array('i', (self.ids[i] for i in vivos))
+        self.mascaras = [self.mascaras[i] for i in vivos]
+        self.notas = array('d', (self.notas[i] for i in vivos))
+        self.anos = array('i', (self.anos[i] for i in vivos))
+        self.indice = {id_filme: k for k, id_filme in enumerate(self.ids)}
+        self.definir_csr(offsets, adjacentes)
 
     def bfs(self, id_inicio, limite=50):
-        if id_inicio not in self.adj:
+        inicio = self.indice.get(id_inicio)
+        if inicio is None:
             return []
-        visitados = set()
-        fila = deque([id_inicio])
-        visitados.add(id_inicio)
+        ids, offsets, adjacentes = self.ids, self.offsets, self.adjacentes
+        # Sem camada mutável, cada linha é lida direto dos arrays do CSR
+        so_csr = not self.extras and not self.removidos and len(offsets) == len(ids) + 1
+        visitados = bytearray(len(ids))
+        visitados[inicio] = 1
+        fila = deque([inicio])
         recomendacoes = []
 
         while fila and len(recomendacoes) < limite:
             v_atual = fila.popleft()
-            if v_atual != id_inicio:
-                recomendacoes.append(v_atual)
-
-            for vizinho in self.adj[v_atual]:
-                if vizinho not in visitados:
-                    visitados.add(vizinho)
+            if v_atual != inicio:
+                recomendacoes.append(ids[v_atual])
+
+            linha = (adjacentes[offsets[v_atual]:offsets[v_atual + 1]] if so_csr
+                     else self._vizinhos_densos(v_atual))
+            for vizinho in linha:
+                if not visitados[vizinho]:
+                    visitados[vizinho] = 1
                     fila.append(vizinho)
         return recomendacoes
 
+    def mais_alcancados(self, ids_sementes, limite=20, profundidade=2, aceitar=None):
+        """Filmes mais alcançados a partir das sementes: [(id, pontuacao, quantas_sementes), ...]."""
+        bits = {}
+        for id_semente in ids_sementes:
+            v = self.indice.get(id_semente)
+            if v is not None and v not in bits:
+                bits[v] = 1 << len(bits)
+        if not bits:
+            return []
+        ids, offsets, adjacentes = self.ids, self.offsets, self.adjacentes
+        so_csr = not self.extras and not self.removidos and len(offsets) == len(ids) + 1
+
+        alcancado = [0] * len(ids)  # vértice -> máscara das sementes que já chegaram nele
+        for v, bit in bits.items():
+            alcancado[v] = bit
+        fronteira = bits
+        pontos = {}
+        for distancia in range(1, profundidade + 1):
+            proxima = {}
+            for v, mascara in fronteira.items():
+                linha = (adjacentes[offsets[v]:offsets[v + 1]] if so_csr
+                         else self._vizinhos_densos(v))
+                for w in linha:
+                    novos = mascara & ~alcancado[w]
+                    if novos:
+                        alcancado[w] |= novos  # os bits de um nível só contam uma vez
+                        proxima[w] = proxima.get(w, 0) | novos
+            if not proxima:
+                break
+            peso = DECAIMENTO_DISTANCIA ** (distancia - 1)
+            for w, novos in proxima.items():
+                pontos[w] = pontos.get(w, 0.0) + novos.bit_count() * peso
+            fronteira = proxima
+
+        for v in bits:
+            pontos.pop(v, None)
+        notas = self.notas
+        candidatos = (w for w in pontos if aceitar is None or aceitar(ids[w]))
+        melhores = heapq.nlargest(limite, candidatos,
+                                  key=lambda w: (pontos[w], alcancado[w].bit_count(), notas[w], -ids[w]))
+        return [(ids[w], pontos[w], alcancado[w].bit_count()) for w in melhores]
+
+    def mais_similares(self, id_inicio, limite=50, aceitar=None, max_visitas=500, expandidos=None):
+        """
+        Busca pela melhor primeiro (Dijkstra com produto dos pesos): a similaridade
+        de um filme é o maior produto de pesos num caminho a partir de id_inicio.
+        Como os pesos são <= 1, cada filme sai do heap com sua similaridade final,
+        em ordem decrescente; a busca para ao juntar `limite` filmes aceitos por
+        `aceitar(id)` (todos, se None) ou após expandir `max_visitas` vértices.
+        Retorna [(id, similaridade), ...]. Se `expandidos` for um set, recebe os IDs
+        dos vértices expandidos: o resultado só muda se as arestas deles mudarem.
+        """
+        return self.mais_similares_de_varios([id_inicio], limite, aceitar, max_visitas, expandidos)
+
+    def mais_similares_de_varios(self, ids_inicio, limite=50, aceitar=None, max_visitas=500, expandidos=None):
+        """
+        Como mais_similares, numa busca só a partir de todos os ids_inicio (todos com
+        similaridade 1.0): cada filme recebe a maior similaridade a qualquer um deles.
+        Os próprios ids_inicio não entram no resultado; IDs fora do grafo são ignorados.
+        """
+        inicios = {self.indice[i] for i in ids_inicio if i in self.indice}
+        if not inicios:
+            return []
+        ids, mascaras, notas, anos = self.ids, self.mascaras, self.notas, self.anos
+        melhor = dict.fromkeys(inicios, 1.0)
+        finalizados = set()
+        heap = [(-1.0, inicio) for inicio in inicios]
+        resultado = []
+
+        while heap and len(resultado) < limite and len(finalizados) < max_visitas:
+            negativo, v_atual = heapq.heappop(heap)
+            if v_atual in finalizados:
+                continue  # entrada antiga: já saiu com similaridade maior
+            finalizados.add(v_atual)
+            similaridade = -negativo
+            if v_atual not in inicios and (aceitar is None or aceitar(ids[v_atual])):
+                resultado.append((ids[v_atual], similaridade))
+
+            # Mesmo cálculo de _peso, com os atributos de v_atual lidos uma vez só
+            mascara_v, nota_v, ano_v = mascaras[v_atual], notas[v_atual], anos[v_atual]
+            for vizinho in self._vizinhos_densos(v_atual):
+                if vizinho in finalizados:
+                    continue
+                m = mascaras[vizinho]
+                uniao = (mascara_v | m).bit_count()
+                generos = (mascara_v & m).bit_count() / uniao if uniao else 0.0
+                ano_w = anos[vizinho]
+                ano = 1.0 / (1.0 + abs(ano_v - ano_w) / 10.0) if ano_v and ano_w else 0.0
+                peso = (PESO_GENEROS * generos + PESO_NOTA / (1.0 + abs(nota_v - notas[vizinho]))
+                        + PESO_ANO * ano)
+                candidata = similaridade * peso
+                if candidata > melhor.get(vizinho, 0.0):
+                    melhor[vizinho] = candidata
+                    heapq.heappush(heap, (-candidata, vizinho))
+        if expandidos is not None:
+            expandidos.update(ids[v] for v in finalizados)
+        return resultado
+
+
+# --- LEITURA RÁPIDA DO CSV ---
+# O data.csv tem uma linha por AVALIAÇÃO: userId,movieId,rating,title,genres,vote_average,release_date,
+# release_year,collection_id,collection_name (as duas últimas só nos CSVs gerados após a inclusão das coleções).
+# Só a primeira linha de cada movieId interessa. O leitor extrai os movieIds de um bloco
+# inteiro com uma regex e, se o bloco não traz filme novo, descarta-o sem criar objetos
+# por linha; só as linhas de filmes novos são decodificadas e passadas ao csv.reader.
+
+TAMANHO_BLOCO_CSV = 16 * 1024 * 1024
+_PADRAO_MOVIE_ID = re.compile(rb'\n[^,\n]*,(\d+),')  # '\n' literal no início acelera a busca
+
+
+def _fim_do_registro(buffer, inicio):
+    """Posição do '\n' que encerra o registro (respeita campos entre aspas com quebra de linha)."""
+    fim = buffer.find(b'\n', inicio)
+    while fim != -1 and buffer.count(b'"', inicio, fim) % 2:
+        fim = buffer.find(b'\n', fim + 1)
+    return len(buffer) + 1 if fim == -1 else fim
+
+
+def colecao_da_linha(campos):
+    """(collection_id, collection_name) de uma linha do data.csv; (0, "") se não houver."""
+    try:
+        colecao_id = int(float(campos[8])) if len(campos) > 8 and campos[8] else 0
+    except ValueError:
+        return 0, ""
+    return colecao_id, (campos[9] if colecao_id and len(campos) > 9 else "")
+
+
+def _projetar_linha(movie_id, linha):
+    """Decodifica uma linha e devolve só as colunas usadas, ou None se for inválida."""
+    try:
+        campos = next(csv.reader([linha.decode('utf-8').rstrip('\r')], escapechar='\\'), [])
+    except csv.Error:
+        return None
+    if len(campos) < 4:
+        return None
+    try:
+        nota = float(campos[5]) if len(campos) > 5 else 0.0
+    except ValueError:
+        nota = 0.0
+    return (movie_id, campos[3], campos[4] if len(campos) > 4 else "",
+            nota, campos[6] if len(campos) > 6 else "") + colecao_da_linha(campos)
+
+
+def ler_registros_csv(arquivo_csv, contagem, inicio=0, fim=None):
+    """
+    Gera (movie_id, titulo, genero, nota, ano, colecao_id, colecao) para a primeira linha de cada movieId
+    no intervalo de bytes [inicio, fim) do arquivo (que deve começar em início de linha).
+    Ao terminar, soma em contagem as chaves 'linhas' e 'duplicadas'.
+    """
+    vistos = set()
+    linhas_lidas = 0
+    registros = 0
+    resto = b''
+    restante = None if fim is None else fim - inicio
+
+    with open(arquivo_csv, 'rb') as f:
+        f.seek(inicio)
+        while True:
+            tamanho = TAMANHO_BLOCO_CSV if restante is None else min(TAMANHO_BLOCO_CSV, restante)
+            bloco = f.read(tamanho) if tamanho > 0 else b''
+            if restante is not None:
+                restante -= len(bloco)
+
+            # O '\n' inicial faz a primeira linha casar com o mesmo padrão das demais
+            buffer = b''.join((b'\n', resto, bloco))
+            if len(buffer) == 1:
+                break
+            corte = buffer.rfind(b'\n') if bloco else len(buffer)
+
+            ids = _PADRAO_MOVIE_ID.findall(buffer, 0, corte)
+            novos = set(ids).difference(vistos)
+            if novos:
+                for m in _PADRAO_MOVIE_ID.finditer(buffer, 0, corte):
+                    chave = m.group(1)
+                    if chave not in novos:
+                        continue
+                    inicio_linha = m.start() + 1
+                    fim_linha = _fim_do_registro(buffer, inicio_linha)
+                    if fim_linha > corte and bloco:
+                        # Registro multilinha que continua no próximo bloco
+                        corte = m.start()
+                        ids = _PADRAO_MOVIE_ID.findall(buffer, 0, corte)
+                        break
+                    novos.discard(chave)
+                    vistos.add(chave)
+                    registro = _projetar_linha(int(chave), buffer[inicio_linha:fim_linha])
+                    if registro:
+                        registros += 1
+                        yield registro
+                    if not novos:
+                        break
+
+            linhas_lidas += len(ids)
+            resto = buffer[corte + 1:]
+            if not bloco:
+                break
+
+    contagem['linhas'] = contagem.get('linhas', 0) + linhas_lidas
+    contagem['duplicadas'] = contagem.get('duplicadas', 0) + linhas_lidas - registros
+
+
+def dividir_csv_em_fatias(arquivo_csv, partes):
+    """
+    Divide o arquivo em até `partes` intervalos de bytes [inicio, fim), todos
+    começando em início de linha (a fronteira avança até o próximo '\n').
+    """
+    tamanho = os.path.getsize(arquivo_csv)
+    fronteiras = [0]
+    with open(arquivo_csv, 'rb') as f:
+        for k in range(1, partes):
+            f.seek(k * tamanho // partes)
+            f.readline()
+            pos = f.tell()
+            if fronteiras[-1] < pos < tamanho:
+                fronteiras.append(pos)
+    fronteiras.append(tamanho)
+    return list(zip(fronteiras, fronteiras[1:]))
+
+
+def _processar_fatia(arquivo_csv, inicio, fim):
+    """Tarefa do pool: registros únicos (por movieId) da fatia, já como tuplas."""
+    contagem = {}
+    registros = list(ler_registros_csv(arquivo_csv, contagem, inicio, fim))
+    return registros, contagem
+
+
+# --- SNAPSHOT BINÁRIO DO CATÁLOGO ---
+# Layout (little-endian): cabeçalho | notas (d) | ids (i) | anos (i) | coleções (i) | ordem por título (i)
+# | offsets de título, gênero, nome da coleção e vizinhos (I, n+1 cada) | vizinhos (i) | textos UTF-8.
+# Vizinhos e ordem guardam a POSIÇÃO do filme no snapshot, não o ID.
+
+SNAPSHOT_MAGIC = b"POPSNAP1"
+SNAPSHOT_VERSAO = 2  # 2: coleção (id e nome) de cada filme
+_CABECALHO_SNAPSHOT = struct.Struct("<8sIqqIIII")  # magic, versão, mtime_ns, tamanho, n, n_ordem, n_vizinhos, n_textos
+
+
+def _assinatura_csv(arquivo_csv):
+    info = os.stat(arquivo_csv)
+    return info.st_mtime_ns, info.st_size
+
+
+def escrever_snapshot(caminho, arquivo_csv, filmes, ordem, vizinhos):
+    """
+    Grava o snapshot do catálogo.
+    filmes: objetos com id, titulo, ano, genero, nota, colecao_id e colecao.
+    ordem: posições (em filmes) na ordem de título da AVL.
+    vizinhos: lista de listas de posições (adjacência do grafo).
+    """
+    mtime_ns, tamanho = _assinatura_csv(arquivo_csv)
+    notas, ids, anos, colecoes = array('d'), array('i'), array('i'), array('i')
+    off_titulos, off_generos, off_colecoes, off_vizinhos = (array('I', [0]) for _ in range(4))
+    lista_vizinhos = array('i')
+    textos = bytearray()
+
+    for filme, viz in zip(filmes, vizinhos):
+        notas.append(filme.nota)
+        ids.append(filme.id)
+        anos.append(filme.ano)
+        colecoes.append(filme.colecao_id)
+        textos += filme.titulo.encode('utf-8')
+        off_titulos.append(len(textos))
+        textos += filme.genero.encode('utf-8')
+        off_generos.append(len(textos))
+        textos += filme.colecao.encode('utf-8')
+        off_colecoes.append(len(textos))
+        lista_vizinhos.extend(viz)
+        off_vizinhos.append(len(lista_vizinhos))
+
+    ordem = array('i', ordem)
+    cabecalho = _CABECALHO_SNAPSHOT.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSAO, mtime_ns, tamanho,
+                                         len(ids), len(ordem), len(lista_vizinhos), len(textos))
+
+    temporario = caminho + ".tmp"
+    with open(temporario, 'wb') as f:
+        f.write(cabecalho)
+        for bloco in (notas, ids, anos, colecoes, ordem, off_titulos, off_generos, off_colecoes,
+                      off_vizinhos, lista_vizinhos):
+            f.write(bloco.tobytes())
+        f.write(textos)
+    os.replace(temporario, caminho)  # troca atômica: leitores nunca veem arquivo pela metade
+
+
+def ler_snapshot(caminho, arquivo_csv):
+    """
+    Lê o snapshot via mmap. Retorna None se não existir, for de outra versão,
+    se o CSV mudou desde que foi gerado (mtime/tamanho diferentes) ou se o arquivo
+    estiver danificado (tamanho diferente do que o cabeçalho indica, texto inválido).
+    Caso contrário retorna (registros, ordem, off_vizinhos, vizinhos), com registros
+    no formato (id, titulo, ano, genero, nota, colecao_id, colecao) e a adjacência em
+    CSR: os vizinhos do filme i são vizinhos[off_vizinhos[i]:off_vizinhos[i + 1]].
+    """
+    try:
+        assinatura = _assinatura_csv(arquivo_csv)
+        f = open(caminho, 'rb')
+    except OSError:
+        return None
+
+    with f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return None  # arquivo vazio
+        with mm:
+            return _decodificar_snapshot(mm, assinatura)
+
+
+def _tamanho_esperado_snapshot(n, n_ordem, n_vizinhos, n_textos):
+    """Tamanho exato, em bytes, de um snapshot com as contagens do cabeçalho."""
+    d, i, u = (struct.calcsize(fmt) for fmt in 'diI')
+    return (_CABECALHO_SNAPSHOT.size + n * (d + 3 * i) + n_ordem * i
+            + 4 * (n + 1) * u + n_vizinhos * i + n_textos)
+
+
+def _decodificar_snapshot(mm, assinatura):
+    """Corpo de ler_snapshot, sobre o arquivo já mapeado."""
+    if len(mm) < _CABECALHO_SNAPSHOT.size:
+        return None
+    magic, versao, mtime_ns, tamanho, n, n_ordem, n_vizinhos, n_textos = \
+        _CABECALHO_SNAPSHOT.unpack_from(mm, 0)
+    if magic != SNAPSHOT_MAGIC or versao != SNAPSHOT_VERSAO or (mtime_ns, tamanho) != assinatura:
+        return None
+    if len(mm) != _tamanho_esperado_snapshot(n, n_ordem, n_vizinhos, n_textos):
+        return None  # truncado ou com lixo no fim: reconstrói a partir do CSV
+
+    pos = _CABECALHO_SNAPSHOT.size
+
+    def fatia(fmt, qtd):
+        nonlocal pos
+        fim = pos + qtd * struct.calcsize(fmt)
+        dados = array(fmt)
+        dados.frombytes(mm[pos:fim])
+        pos = fim
+        return dados
+
+    notas = fatia('d', n)
+    ids = fatia('i', n)
+    anos = fatia('i', n)
+    colecoes = fatia('i', n)
+    ordem = fatia('i', n_ordem).tolist()
+    off_titulos = fatia('I', n + 1)
+    off_generos = fatia('I', n + 1)
+    off_colecoes = fatia('I', n + 1)
+    off_vizinhos = fatia('I', n + 1)
+    lista_vizinhos = fatia('i', n_vizinhos)
+    textos = mm[pos:pos + n_textos]
+    if off_colecoes[n] != n_textos or off_vizinhos[n] != n_vizinhos:
+        return None  # offsets inconsistentes com o cabeçalho
+
+    registros = []
+    try:
+        for i in range(n):
+            titulo = textos[off_colecoes[i]:off_titulos[i + 1]].decode('utf-8')
+            genero = textos[off_titulos[i + 1]:off_generos[i + 1]].decode('utf-8')
+            colecao = textos[off_generos[i + 1]:off_colecoes[i + 1]].decode('utf-8')
+            registros.append((ids[i], titulo, anos[i], genero, notas[i], colecoes[i], colecao))
+    except UnicodeDecodeError:
+        return None  # texto danificado: reconstrói a partir do CSV
+
+    return registros, ordem, off_vizinhos, lista_vizinhos
+
+
+# --- CACHE DE RECOMENDAÇÕES ---
+
+TAMANHO_CACHE_RECOMENDACOES = 2048
+LIMIAR_SIMILARIDADE_TITULO = 0.8
+
+
+class CacheRecomendacoes:
+    """
+    Cache LRU (OrderedDict) de recomendações por ID de filme. Cada entrada guarda
+    os IDs de que o resultado depende (filme base, vértices expandidos na busca,
+    filmes recomendados); invalidar(ids) descarta só as entradas afetadas.
+    Seguro entre threads: toda operação roda sob uma trava.
+    """
+
+    def __init__(self, capacidade=TAMANHO_CACHE_RECOMENDACOES):
+        self.capacidade = capacidade
+        self.entradas = OrderedDict()  # id do filme -> (valor, dependências)
+        self.dependentes = {}          # id de uma dependência -> {ids com entrada que dependem dele}
+        self.acertos = 0
+        self.faltas = 0
+        self.trava = threading.RLock()
+
+    def __len__(self):
+        return len(self.entradas)
+
+    def __contains__(self, chave):
+        return chave in self.entradas
+
+    def chaves(self):
+        """Cópia dos IDs com entrada no cache."""
+        with self.trava:
+            return list(self.entradas)
+
+    def obter(self, chave):
+        """Valor guardado (passa a ser o mais recente) ou None."""
+        with self.trava:
+            entrada = self.entradas.get(chave)
+            if entrada is None:
+                self.faltas += 1
+                return None
+            self.entradas.move_to_end(chave)
+            self.acertos += 1
+            return entrada[0]
+
+    def guardar(self, chave, valor, dependencias):
+        dependencias = frozenset(dependencias)
+        with self.trava:
+            if self.capacidade <= 0:
+                return
+            self.descartar(chave)
+            self.entradas[chave] = (valor, dependencias)
+            for id_filme in dependencias:
+                self.dependentes.setdefault(id_filme, set()).add(chave)
+            while len(self.entradas) > self.capacidade:
+                self.descartar(next(iter(self.entradas)))  # a menos usada recentemente
+
+    def descartar(self, chave):
+        with self.trava:
+            entrada = self.entradas.pop(chave, None)
+            if entrada is None:
+                return
+            for id_filme in entrada[1]:
+                chaves = self.dependentes.get(id_filme)
+                if chaves is not None:
+                    chaves.discard(chave)
+                    if not chaves:
+                        del self.dependentes[id_filme]
+
+    def invalidar(self, ids):
+        """Descarta as entradas que dependem de algum dos IDs."""
+        with self.trava:
+            for id_filme in ids:
+                for chave in list(self.dependentes.get(id_filme, ())):
+                    self.descartar(chave)
+
+    def limpar(self):
+        with self.trava:
+            self.entradas.clear()
+            self.dependentes.clear()
+
+    def itens(self):
+        """Cópia das entradas como (id, valor, dependências), da menos à mais recente."""
+        with self.trava:
+            return [(chave, valor, dependencias) for chave, (valor, dependencias) in self.entradas.items()]
+
+
+# --- RECOMENDAÇÕES PRÉ-CALCULADAS ---
+# Layout (little-endian): cabeçalho | ids base (i) | offsets das recomendações e das
+# dependências (I, n+1 cada) | IDs recomendados (i) | similaridades (d, NaN = Nome/Franquia)
+# | dependências (i). Vale só para o CSV (mtime/tamanho) e o nº de filmes gravados.
+
+RECOMENDACOES_MAGIC = b"POPRECS1"
+RECOMENDACOES_VERSAO = 1
+_CABECALHO_RECOMENDACOES = struct.Struct("<8sIqqIIII")  # magic, versão, mtime_ns, tamanho, filmes, n, n_recs, n_deps
+
+
+def escrever_recomendacoes(caminho, arquivo_csv, total_filmes, entradas):
+    """
+    Grava recomendações calculadas. entradas: (id base, [(id, similaridade ou None), ...],
+    IDs de que dependem); total_filmes: tamanho do catálogo em que foram calculadas.
+    """
+    mtime_ns, tamanho = _assinatura_csv(arquivo_csv)
+    chaves, ids, similaridades, dependencias = array('i'), array('i'), array('d'), array('i')
+    off_recs, off_deps = array('I', [0]), array('I', [0])
+    for chave, recomendacoes, deps in entradas:
+        chaves.append(chave)
+        for id_filme, similaridade in recomendacoes:
+            ids.append(id_filme)
+            similaridades.append(math.nan if similaridade is None else similaridade)
+        off_recs.append(len(ids))
+        dependencias.extend(sorted(deps))
+        off_deps.append(len(dependencias))
+
+    cabecalho = _CABECALHO_RECOMENDACOES.pack(RECOMENDACOES_MAGIC, RECOMENDACOES_VERSAO, mtime_ns, tamanho,
+                                              total_filmes, len(chaves), len(ids), len(dependencias))
+    temporario = caminho + ".tmp"
+    with open(temporario, 'wb') as f:
+        f.write(cabecalho)
+        for bloco in (chaves, off_recs, off_deps, ids, similaridades, dependencias):
+            f.write(bloco.tobytes())
+    os.replace(temporario, caminho)
+
+
+def ler_recomendacoes(caminho, arquivo_csv, total_filmes):
+    """
+    Lê o que escrever_recomendacoes gravou. Retorna None se não existir, for de outra
+    versão, de outro CSV ou catálogo, ou estiver danificado; senão a lista de entradas.
+    """
+    try:
+        assinatura = _assinatura_csv(arquivo_csv)
+        with open(caminho, 'rb') as f:
+            dados = f.read()
+    except OSError:
+        return None
+
+    if len(dados) < _CABECALHO_RECOMENDACOES.size:
+        return None
+    magic, versao, mtime_ns, tamanho, filmes, n, n_recs, n_deps = \
+        _CABECALHO_RECOMENDACOES.unpack_from(dados, 0)
+    if (magic != RECOMENDACOES_MAGIC or versao != RECOMENDACOES_VERSAO
+            or (mtime_ns, tamanho) != assinatura or filmes != total_filmes):
+        return None
+    d, i, u = (struct.calcsize(fmt) for fmt in 'diI')
+    if len(dados) != _CABECALHO_RECOMENDACOES.size + n * i + 2 * (n + 1) * u + n_recs * (i + d) + n_deps * i:
+        return None
+
+    pos = _CABECALHO_RECOMENDACOES.size
+
+    def fatia(fmt, qtd):
+        nonlocal pos
+        fim = pos + qtd * struct.calcsize(fmt)
+        bloco = array(fmt)
+        bloco.frombytes(dados[pos:fim])
+        pos = fim
+        return bloco
+
+    chaves = fatia('i', n)
+    off_recs = fatia('I', n + 1)
+    off_deps = fatia('I', n + 1)
+    ids = fatia('i', n_recs)
+    similaridades = fatia('d', n_recs)
+    dependencias = fatia('i', n_deps)
+    if off_recs[n] != n_recs or off_deps[n] != n_deps:
+        return None
+
+    entradas = []
+    for k in range(n):
+        recomendacoes = [(ids[j], None if math.isnan(similaridades[j]) else similaridades[j])
+                         for j in range(off_recs[k], off_recs[k + 1])]
+        entradas.append((chaves[k], recomendacoes, dependencias[off_deps[k]:off_deps[k + 1]]))
+    return entradas
+
+
+# --- CONSULTA POR VÁRIOS CRITÉRIOS ---
+
+# Ordenações de SistemaRecomendacao.consultar. "nota" e "ano" seguem a ordem dos
+# índices (desempate por ID), para poder parar cedo quando o índice usado já está nela
+CHAVES_ORDENACAO = {
+    "nota": lambda f: (-f.nota, f.id),
+    "ano": lambda f: (-f.ano, f.id),
+    "titulo": lambda f: (f.chave, f.id),
+}
+
 
 # --- CLASSE PRINCIPAL (LÓGICA) ---
 
@@ -256,23 +1266,174 @@ class SistemaRecomendacao:
     Não possui prints nem inputs. Retorna dados e levanta exceções.
     """
 
-    def __init__(self, arquivo_csv):
+    def __init__(self, arquivo_csv, tamanho_cache=TAMANHO_CACHE_RECOMENDACOES):
         self.avl_root = None
         self.avl = ArvoreAVL()
         self.grafo_similaridade = Grafo()
         self.mapa_id_filme = {}
         self.arquivo_csv = arquivo_csv
+        self.arquivo_snapshot = arquivo_csv + ".snap"
+        self.arquivo_recomendacoes = arquivo_csv + ".recs"  # ver salvar_recomendacoes
         self.filmes_carregados = []
+        # Como foi a última carga ('origem': 'snapshot' ou 'csv', contagens, avisos);
+        # quem usa a classe decide se e como mostrar
+        self.estatisticas_carga = {}
+        # Índice invertido: bit do gênero -> [(-nota, id), ...] ordenado (melhor nota primeiro)
+        self.indice_generos = {}
+        self.ranking_global = []  # mesmo formato, com todos os filmes
+        self.indice_anos = []  # [(-ano, id), ...] ordenado (mais recente primeiro)
+        # [(chave do título, id), ...] ordenado, com todos os filmes (a AVL guarda um
+        # só por título); usado na consulta por prefixo
+        self.indice_chaves = []
+        self.indice_titulos = IndiceTrigramas(self.mapa_id_filme)  # só os filmes da AVL
+        # Montado no primeiro uso, uma vez só, sob trava_similaridade (ver _similaridade_titulos):
+        # a carga pelo snapshot não paga o MinHash de todo o catálogo
+        self.indice_similaridade = None
+        self.trava_similaridade = threading.Lock()
+        self.indice_colecoes = {}  # collection_id -> {ids dos filmes da coleção}
+        self.cache_recomendacoes = CacheRecomendacoes(tamanho_cache)
+        # Sobe a cada mudança no catálogo (carga, inclusão, remoção): quem guarda
+        # respostas derivadas dele compara com a versão em que as gerou
+        self.versao_catalogo = 0
+        self.versao_da_carga = 0  # versao_catalogo logo após carregar_dados (catálogo = CSV)
+
+    def carregar_dados(self, usar_snapshot=True, modo="rapido", processos=None):
+        """
+        Constrói as estruturas a partir do snapshot binário, se estiver em dia
+        com o CSV; senão lê o CSV e (re)gera o snapshot. Lança exceção se falhar.
+        modo: "rapido" (blocos grandes, só decodifica filmes novos), "paralelo"
+        (fatias do arquivo lidas em `processos` processos) ou "csv" (csv.reader linha a linha).
+        """
+        if not (usar_snapshot and self._carregar_snapshot()):
+            self._carregar_csv_modo(modo, processos)
+            if usar_snapshot:
+                self._salvar_snapshot()
+
+        self._construir_indice_generos()
+        self._construir_indices_consulta()
+        self._construir_indice_titulos()
+        self.indice_similaridade = None
+        self._construir_indice_colecoes()
+        self.cache_recomendacoes.limpar()
+        self.versao_catalogo += 1
+        self.versao_da_carga = self.versao_catalogo
+        if usar_snapshot:
+            self._carregar_recomendacoes()
+
+    def _carregar_csv_modo(self, modo, processos):
+        """Lê o CSV no modo pedido e monta a AVL e as arestas do grafo."""
+        if modo == "rapido":
+            self._carregar_csv_rapido()
+        elif modo == "paralelo":
+            self._carregar_csv_paralelo(processos)
+        elif modo == "csv":
+            self._carregar_csv()
+        else:
+            raise ValueError(f"Modo de carga desconhecido: {modo}")
+        self.avl_root = self.avl.construir(self.filmes_carregados)
+        self._construir_arestas_grafo()
+
+    def _carregar_snapshot(self):
+        """Popula as estruturas a partir do snapshot. Retorna False se não houver um válido."""
+        dados = ler_snapshot(self.arquivo_snapshot, self.arquivo_csv)
+        if dados is None:
+            return False
+
+        registros, ordem, off_vizinhos, vizinhos = dados
+        filmes = [Filme(id, titulo, ano, genero, nota, colecao_id=colecao_id, colecao=colecao)
+                  for id, titulo, ano, genero, nota, colecao_id, colecao in registros]
+
+        # A ordem de título já vem pronta: a ordenação em construir() fica linear
+        self.avl_root = self.avl.construir([filmes[i] for i in ordem])
+
+        for filme in filmes:
+            self.grafo_similaridade.adicionar_vertice(filme.id, filme.mascara_generos, filme.nota, filme.ano)
+            self.mapa_id_filme[filme.id] = filme
+        # Vértices adicionados na ordem do snapshot: o CSR gravado vale como está
+        self.grafo_similaridade.definir_csr(off_vizinhos, vizinhos)
+
+        self.estatisticas_carga = {
+            'origem': 'snapshot',
+            'arquivo': self.arquivo_snapshot,
+            'filmes': len(filmes),
+        }
+        return True
+
+    def _salvar_snapshot(self):
+        """Grava o snapshot do catálogo atual. Falha de escrita não impede o uso do sistema."""
+        filmes = list(self.mapa_id_filme.values())
+        posicao = {filme.id: i for i, filme in enumerate(filmes)}
+        ordem = [posicao[f.id] for f in self.avl.travessia_em_ordem(self.avl_root)]
+        vizinhos = [sorted(posicao[v] for v in self.grafo_similaridade.vizinhos(filme.id)) for filme in filmes]
+        try:
+            escrever_snapshot(self.arquivo_snapshot, self.arquivo_csv, filmes, ordem, vizinhos)
+        except OSError as e:
+            self.estatisticas_carga['aviso_snapshot'] = f"não foi possível gravar o snapshot ({e})"
+
+    def _registrar_filme(self, filme):
+        """Registra um filme recém-lido. A AVL é montada de uma vez ao fim da carga."""
+        self.grafo_similaridade.adicionar_vertice(filme.id, filme.mascara_generos, filme.nota, filme.ano)
+        self.mapa_id_filme[filme.id] = filme
+        self.filmes_carregados.append(filme)
+
+    def _carregar_csv_rapido(self):
+        """Lê o CSV em blocos, pulando avaliações repetidas antes de decodificá-las."""
+        contagem = {}
+        inicio = time.perf_counter()
+
+        for movie_id, titulo, genero, nota, ano, colecao_id, colecao in ler_registros_csv(self.arquivo_csv, contagem):
+            self._registrar_filme(Filme(movie_id, titulo, ano, genero, nota,
+                                        colecao_id=colecao_id, colecao=colecao))
 
-    def carregar_dados(self):
-        """Lê o CSV e constrói as estruturas. Lança exceção se falhar."""
+        self._registrar_estatisticas_carga(contagem, time.perf_counter() - inicio)
+
+    def _carregar_csv_paralelo(self, processos=None):
+        """
+        Lê fatias do CSV em paralelo. Cada processo já remove os movieIds repetidos
+        da sua fatia; aqui as fatias são juntadas em ordem, mantendo a primeira
+        ocorrência de cada filme (mesmo resultado da leitura sequencial).
+        """
+        processos = processos or os.cpu_count() or 1
+        inicio = time.perf_counter()
+        fatias = dividir_csv_em_fatias(self.arquivo_csv, processos)
+
+        contagem = {'linhas': 0, 'duplicadas': 0}
+        ids_vistos = set()
+        with ProcessPoolExecutor(max_workers=processos) as pool:
+            resultados = pool.map(_processar_fatia, [self.arquivo_csv] * len(fatias),
+                                  *zip(*fatias))
+            for registros, contagem_fatia in resultados:
+                contagem['linhas'] += contagem_fatia['linhas']
+                contagem['duplicadas'] += contagem_fatia['duplicadas']
+                for movie_id, titulo, genero, nota, ano, colecao_id, colecao in registros:
+                    if movie_id in ids_vistos:
+                        contagem['duplicadas'] += 1
+                        continue
+                    ids_vistos.add(movie_id)
+                    self._registrar_filme(Filme(movie_id, titulo, ano, genero, nota,
+                                                colecao_id=colecao_id, colecao=colecao))
+
+        self._registrar_estatisticas_carga(contagem, time.perf_counter() - inicio)
+
+    def _registrar_estatisticas_carga(self, contagem, segundos):
+        linhas = contagem.get('linhas', 0)
+        self.estatisticas_carga = {
+            'origem': 'csv',
+            'linhas': linhas,
+            'duplicadas': contagem.get('duplicadas', 0),
+            'filmes': len(self.filmes_carregados),
+            'segundos': segundos,
+            'linhas_por_segundo': linhas / segundos if segundos > 0 else 0.0,
+        }
+
+    def _carregar_csv(self):
+        """Lê o CSV linha a linha, mantendo só a primeira linha de cada movieId."""
         ids_vistos = set()
 
         with open(self.arquivo_csv, mode='r', encoding='utf-8') as f:
             leitor = csv.reader(f, delimiter=',', quotechar='"', escapechar='\\')
             next(leitor, None)  # Pula header
-            linha_debug = next(leitor, None)
-            print("Primeira linha processável:", linha_debug)
+            self.estatisticas_carga = {'origem': 'csv', 'primeira_linha': next(leitor, None)}
 
             for linha in leitor:
                 try:
@@ -287,57 +1448,264 @@ class SistemaRecomendacao:
                     except:
                         nota = 0.0
                     ano = linha[6] if len(linha) > 6 else ""
+                    colecao_id, colecao = colecao_da_linha(linha)
 
                     # Se no seu CSV houver um campo de imagem, use-o; caso contrário, passe None
                     img_url = None
                     # Se houver uma coluna com poster_path no CSV, substitua img_url = linha[<index>]
 
-                    filme = Filme(movie_id, titulo, ano, genero, nota, img=img_url)
+                    filme = Filme(movie_id, titulo, ano, genero, nota, img=img_url,
+                                  colecao_id=colecao_id, colecao=colecao)
 
                     # Popula estruturas
-                    self.avl_root = self.avl.inserir(self.avl_root, filme)
-                    self.grafo_similaridade.adicionar_vertice(filme.id)
-                    self.mapa_id_filme[filme.id] = filme
-                    self.filmes_carregados.append(filme)
+                    self._registrar_filme(filme)
                 except (IndexError, ValueError):
                     continue
 
-        # Constrói grafo após carregar tudo
-        self._construir_arestas_grafo()
+    def _construir_indice_generos(self):
+        indice = {}
+        for filme in self.mapa_id_filme.values():
+            for bit in REGISTRO_GENEROS.bits_da_mascara(filme.mascara_generos):
+                indice.setdefault(bit, []).append((-filme.nota, filme.id))
+        for lista in indice.values():
+            lista.sort()
+        self.indice_generos = indice
+        self.ranking_global = sorted((-f.nota, f.id) for f in self.mapa_id_filme.values())
+
+    def _construir_indices_consulta(self):
+        self.indice_anos = sorted((-f.ano, f.id) for f in self.mapa_id_filme.values())
+        self.indice_chaves = sorted((f.chave, f.id) for f in self.mapa_id_filme.values())
+
+    def _construir_indice_titulos(self):
+        self.indice_titulos = IndiceTrigramas(self.mapa_id_filme)
+        for filme in self.avl.iterar_em_ordem(self.avl_root):
+            self.indice_titulos.adicionar(filme.id, filme.chave)
+
+    def _construir_indice_similaridade(self):
+        indice = IndiceSimilaridadeTitulos(self.indice_titulos)
+        for filme in self.avl.iterar_em_ordem(self.avl_root):
+            indice.adicionar(filme.id, filme.chave)
+        self.indice_similaridade = indice
+
+    def _construir_indice_colecoes(self):
+        indice = {}
+        for filme in self.mapa_id_filme.values():
+            if filme.colecao_id:
+                indice.setdefault(filme.colecao_id, set()).add(filme.id)
+        self.indice_colecoes = indice
+
+    def filmes_da_colecao(self, colecao_id):
+        """Filmes da coleção (franquia), em ordem de lançamento."""
+        filmes = [self.mapa_id_filme[i] for i in self.indice_colecoes.get(colecao_id, ())]
+        filmes.sort(key=lambda f: (f.ano, f.chave))
+        return filmes
+
+    def _similaridade_titulos(self):
+        """Índice MinHash/LSH dos títulos, montado no primeiro uso."""
+        if self.indice_similaridade is None:
+            with self.trava_similaridade:
+                if self.indice_similaridade is None:
+                    self._construir_indice_similaridade()
+        return self.indice_similaridade
+
+    def _indexar_generos(self, filme):
+        chave = (-filme.nota, filme.id)
+        bisect.insort(self.ranking_global, chave)
+        for bit in REGISTRO_GENEROS.bits_da_mascara(filme.mascara_generos):
+            bisect.insort(self.indice_generos.setdefault(bit, []), chave)
+
+    def _desindexar_generos(self, filme):
+        chave = (-filme.nota, filme.id)
+        for lista in [self.ranking_global] + [self.indice_generos.get(bit, [])
+                                              for bit in REGISTRO_GENEROS.bits_da_mascara(filme.mascara_generos)]:
+            i = bisect.bisect_left(lista, chave)
+            if i < len(lista) and lista[i] == chave:
+                del lista[i]
+
+    def _indexar_consulta(self, filme):
+        bisect.insort(self.indice_anos, (-filme.ano, filme.id))
+        bisect.insort(self.indice_chaves, (filme.chave, filme.id))
+
+    def _desindexar_consulta(self, filme):
+        for lista, chave in ((self.indice_anos, (-filme.ano, filme.id)),
+                             (self.indice_chaves, (filme.chave, filme.id))):
+            i = bisect.bisect_left(lista, chave)
+            if i < len(lista) and lista[i] == chave:
+                del lista[i]
+
+    def melhores_por_nota(self, generos=None, limite=20):
+        """
+        Os `limite` filmes de maior nota, opcionalmente só dos gêneros pedidos
+        (basta ter um deles). Lê as listas já ordenadas: O(limite) para um gênero,
+        merge por heap (O(limite log g)) para vários.
+        """
+        if not generos:
+            listas = [self.ranking_global]
+        else:
+            bits = {REGISTRO_GENEROS.bit_por_nome(g) for g in generos}
+            listas = [self.indice_generos[b] for b in bits if b in self.indice_generos]
+
+        resultado = []
+        anterior = None
+        for chave in heapq.merge(*listas):
+            if len(resultado) >= limite:
+                break
+            if chave == anterior:
+                continue  # filme presente em mais de um dos gêneros pedidos
+            anterior = chave
+            resultado.append(self.mapa_id_filme[chave[1]])
+        return resultado
+
+    def consultar(self, ano_min=None, ano_max=None, nota_min=None, nota_max=None,
+                  generos=None, todos_generos=False, prefixo=None, ordenar="nota", limite=20):
+        """Filmes que atendem aos filtros dados (None = sem filtro); retorna (filmes, indice_usado)."""
+        if ordenar not in CHAVES_ORDENACAO:
+            raise ValueError(f"Ordenação desconhecida: {ordenar}")
+        if limite < 1:
+            raise ValueError("limite deve ser pelo menos 1")
+        if any(v is not None and math.isnan(v) for v in (nota_min, nota_max)):
+            raise ValueError("Nota inválida: NaN")
+
+        mascaras = []
+        for nome in generos or ():
+            bit = REGISTRO_GENEROS.bit_por_nome(nome)
+            if bit is not None and self.indice_generos.get(bit):
+                mascaras.append(1 << bit)
+            elif todos_generos:
+                return [], "generos"  # gênero sem filmes: nenhum tem todos
+        if generos and not mascaras:
+            return [], "generos"
+        mascara = 0
+        for m in mascaras:
+            mascara |= m
+        chave_prefixo = normalizar_titulo(prefixo) if prefixo else None
+
+        # Percorre lista[lo:hi] por índice, sem copiar a faixa: o plano pode parar em `limite`
+        def itens(lista, lo, hi):
+            return (lista[k] for k in range(lo, hi))
+
+        def ids(lista, lo, hi):
+            return (lista[k][1] for k in range(lo, hi))
+
+        # Fatia [lo, hi) de uma lista em (-nota, id) com nota na faixa pedida
+        def faixa_nota(lista):
+            lo = bisect.bisect_left(lista, (-nota_max,)) if nota_max is not None else 0
+            hi = bisect.bisect_right(lista, (-nota_min, float('inf'))) if nota_min is not None else len(lista)
+            return lo, hi
+
+        # Candidatos por índice: (quantidade, nome, ordem em que saem, gerador de IDs)
+        planos = []
+        lo, hi = faixa_nota(self.ranking_global)
+        planos.append((hi - lo, "nota", "nota", lambda lo=lo, hi=hi: ids(self.ranking_global, lo, hi)))
+        if mascaras:
+            fatias = [(self.indice_generos[m.bit_length() - 1], *faixa_nota(self.indice_generos[m.bit_length() - 1]))
+                      for m in mascaras]
+            if todos_generos:
+                lista, lo_g, hi_g = min(fatias, key=lambda f: f[2] - f[1])
+                planos.append((hi_g - lo_g, "generos", "nota", lambda: ids(lista, lo_g, hi_g)))
+            else:
+                def ids_generos():
+                    anterior = None
+                    for chave in heapq.merge(*(itens(lista, lo_g, hi_g) for lista, lo_g, hi_g in fatias)):
+                        if chave != anterior:  # filme em mais de um dos gêneros pedidos
+                            anterior = chave
+                            yield chave[1]
+                planos.append((sum(hi_g - lo_g for _, lo_g, hi_g in fatias), "generos", "nota", ids_generos))
+        # Ano e título entram mesmo sem filtro: percorridos inteiros, servem à ordenação
+        lo_a = bisect.bisect_left(self.indice_anos, (-ano_max,)) if ano_max is not None else 0
+        hi_a = bisect.bisect_left(self.indice_anos, (-ano_min + 1,)) if ano_min is not None else len(self.indice_anos)
+        planos.append((hi_a - lo_a, "ano", "ano", lambda: ids(self.indice_anos, lo_a, hi_a)))
+        lo_t, hi_t = 0, len(self.indice_chaves)
+        if chave_prefixo:
+            lo_t = bisect.bisect_left(self.indice_chaves, (chave_prefixo,))
+            hi_t = bisect.bisect_left(self.indice_chaves, (chave_prefixo + "\U0010ffff",))
+        planos.append((hi_t - lo_t, "titulo", "titulo", lambda: ids(self.indice_chaves, lo_t, hi_t)))
+
+        # Custo = candidatos percorridos. Um índice já na ordem pedida para após `limite`
+        # resultados: ~limite / (fração que passa nos filtros), supondo filtros independentes
+        n = max(1, len(self.mapa_id_filme))
+        estimados = n
+        for quantidade, indice, *_ in planos:
+            if indice != "generos":
+                estimados *= quantidade / n
+        if mascaras:
+            tamanhos = [len(self.indice_generos[m.bit_length() - 1]) / n for m in mascaras]
+            if todos_generos:
+                for fracao in tamanhos:
+                    estimados *= fracao
+            else:
+                estimados *= min(1.0, sum(tamanhos))
+
+        def custo(plano):
+            quantidade, _, ordem, _ = plano
+            if ordem != ordenar or estimados <= limite:
+                return quantidade
+            return min(quantidade, limite * quantidade / estimados)
+
+        _, indice_usado, ordem, gerar_ids = min(planos, key=custo)
+
+        def atende(f):
+            return ((ano_min is None or f.ano >= ano_min) and (ano_max is None or f.ano <= ano_max)
+                    and (nota_min is None or f.nota >= nota_min) and (nota_max is None or f.nota <= nota_max)
+                    and (not mascara or (f.mascara_generos & mascara == mascara if todos_generos
+                                         else f.mascara_generos & mascara))
+                    and (chave_prefixo is None or f.chave.startswith(chave_prefixo)))
+
+        filmes = (f for f in map(self.mapa_id_filme.__getitem__, gerar_ids()) if atende(f))
+        if ordem == ordenar:
+            return list(islice(filmes, limite)), indice_usado
+        return heapq.nsmallest(limite, filmes, key=CHAVES_ORDENACAO[ordenar]), indice_usado
+
+    def listar_generos(self):
+        """Nomes dos gêneros com pelo menos um filme, em ordem alfabética."""
+        return sorted(REGISTRO_GENEROS.nomes[bit] for bit, lista in self.indice_generos.items() if lista)
+
+    def mascara_do_genero(self, nome):
+        """Máscara de um gênero pelo nome (0 se desconhecido)."""
+        bit = REGISTRO_GENEROS.bit_por_nome(nome)
+        return 0 if bit is None else 1 << bit
 
     def _construir_arestas_grafo(self):
+        """Liga cada filme aos próximos JANELA_VIZINHOS do mesmo gênero com nota próxima."""
+        grafo = self.grafo_similaridade
         generos_map = {}
         for filme in self.filmes_carregados:
-            lista_generos = [g.strip() for g in filme.genero.split('|') if g.strip()]
-            for g in lista_generos:
-                if g not in generos_map: generos_map[g] = []
-                generos_map[g].append(filme)
-
-        LIMITE_DIFERENCA_NOTA = 1.0
-        JANELA_VIZINHOS = 10
+            for bit in REGISTRO_GENEROS.bits_da_mascara(filme.mascara_generos):
+                generos_map.setdefault(bit, []).append(filme)
 
+        linhas = [[] for _ in range(len(grafo.ids))]
         for lista_filmes in generos_map.values():
             lista_filmes.sort(key=lambda x: x.nota)
             n = len(lista_filmes)
-            for i in range(n):
-                filme_a = lista_filmes[i]
-                for j in range(i + 1, min(i + 1 + JANELA_VIZINHOS, n)):
-                    filme_b = lista_filmes[j]
-                    if abs(filme_a.nota - filme_b.nota) <= LIMITE_DIFERENCA_NOTA:
-                        self.grafo_similaridade.adicionar_aresta(filme_a.id, filme_b.id)
-                    else:
-                        break
+            notas = [f.nota for f in lista_filmes]
+            vertices = [grafo.indice[f.id] for f in lista_filmes]
+
+            frente, tras = [0] * n, [0] * n
+            for k in range(1, JANELA_VIZINHOS + 1):
+                # mascara[p]: posições p e p + k estão perto o bastante na nota
+                mascara = [b - a <= LIMITE_DIFERENCA_NOTA for a, b in zip(notas, notas[k:])]
+                if not any(mascara):
+                    break  # a diferença só cresce com k
+                frente = list(map(add, frente, chain(mascara, repeat(False, k))))
+                tras = list(map(add, tras, chain(repeat(False, k), mascara)))
+
+            for p, v in enumerate(vertices):
+                linha = linhas[v]
+                linha.extend(vertices[p - tras[p]:p])
+                linha.extend(vertices[p + 1:p + 1 + frente[p]])
+
+        grafo.compactar(linhas)
         self.filmes_carregados = []  # Limpa memória auxiliar
 
     def salvar_dados(self, arquivo_saida="filmes_catalogo_processado.csv"):
-        filmes_ordenados = self.avl.travessia_em_ordem(self.avl_root)
+        filmes_ordenados = self.avl.iterar_em_ordem(self.avl_root)
         with open(arquivo_saida, mode='w', encoding='utf-8', newline='') as f:
             escritor = csv.writer(f)
             escritor.writerow(['id', 'title', 'year', 'genre', 'vote_average'])
             for filme in filmes_ordenados:
                 escritor.writerow([filme.id, filme.titulo, filme.ano, filme.genero, filme.nota])
 
-    def adicionar_filme(self, id, titulo, ano, genero, nota):
+    def adicionar_filme(self, id, titulo, ano, genero, nota, colecao_id=0, colecao=""):
         """Adiciona um filme. Lança ValueError se ID ou Título já existirem."""
         if id in self.mapa_id_filme:
             raise ValueError(f"ID {id} já existe.")
@@ -345,19 +1713,53 @@ class SistemaRecomendacao:
         if self.avl.buscar_exato(self.avl_root, titulo):
             raise ValueError(f"Título '{titulo}' já existe.")
 
-        filme = Filme(id, titulo, ano, genero, nota)
+        filme = Filme(id, titulo, ano, genero, nota, colecao_id=colecao_id, colecao=colecao)
 
+        # Grafo antes da AVL: se algo falhar aqui, a AVL ainda não foi alterada
+        self.grafo_similaridade.adicionar_vertice(filme.id, filme.mascara_generos, filme.nota, filme.ano)
         self.avl_root = self.avl.inserir(self.avl_root, filme)
-        self.grafo_similaridade.adicionar_vertice(filme.id)
         self.mapa_id_filme[filme.id] = filme
-
-        # Atualiza arestas do grafo para o novo filme
-        for outro_id, outro_filme in self.mapa_id_filme.items():
-            if outro_id != filme.id and outro_filme.genero == filme.genero:
-                self.grafo_similaridade.adicionar_aresta(filme.id, outro_id)
+        self._indexar_generos(filme)
+        self._indexar_consulta(filme)
+        self.indice_titulos.adicionar(filme.id, filme.chave)
+        with self.trava_similaridade:
+            if self.indice_similaridade is not None:
+                self.indice_similaridade.adicionar(filme.id, filme.chave)
+        if filme.colecao_id:
+            self.indice_colecoes.setdefault(filme.colecao_id, set()).add(filme.id)
+
+        self._conectar_no_grafo(filme)
+        self._invalidar_recomendacoes_de_novo(filme)
+        self.versao_catalogo += 1
 
         return filme
 
+    def _conectar_no_grafo(self, filme):
+        """
+        Liga um filme novo (já em indice_generos): em cada gênero, até JANELA_VIZINHOS
+        filmes de cada lado na ordem de nota, com diferença de nota até
+        LIMITE_DIFERENCA_NOTA. Bisseção na lista do gênero: O(g·log n).
+        Aproxima _construir_arestas_grafo, mas não o reproduz: entre notas empatadas a
+        lista do gênero está em ordem de id (a carga usa a ordem de leitura), e as
+        janelas dos filmes já ligados não são refeitas.
+        """
+        for bit in REGISTRO_GENEROS.bits_da_mascara(filme.mascara_generos):
+            lista = self.indice_generos[bit]
+            # Com a lista em -nota, o início do grupo de mesma nota separa as notas
+            # maiores (antes) dos empatados, em ordem de id, e das notas menores (depois)
+            p = bisect.bisect_left(lista, (-filme.nota,))
+            for q in range(p - 1, max(p - 1 - JANELA_VIZINHOS, -1), -1):
+                if -lista[q][0] - filme.nota > LIMITE_DIFERENCA_NOTA:
+                    break
+                self.grafo_similaridade.adicionar_aresta(filme.id, lista[q][1])
+            ligados = 0
+            for q in range(p, len(lista)):
+                if ligados == JANELA_VIZINHOS or filme.nota + lista[q][0] > LIMITE_DIFERENCA_NOTA:
+                    break
+                if lista[q][1] != filme.id:
+                    self.grafo_similaridade.adicionar_aresta(filme.id, lista[q][1])
+                    ligados += 1
+
     def remover_filme(self, titulo):
         """Remove por título e retorna o objeto removido (ou None)."""
         nova_raiz, filme_removido = self.avl.remover(self.avl_root, titulo)
@@ -365,15 +1767,61 @@ class SistemaRecomendacao:
         if filme_removido:
             self.avl_root = nova_raiz
             self.grafo_similaridade.remover_vertice(filme_removido.id)
+            # Índices de título antes do mapa: eles leem o título de lá
+            self.indice_titulos.remover(filme_removido.id, filme_removido.chave)
+            with self.trava_similaridade:
+                if self.indice_similaridade is not None:
+                    self.indice_similaridade.remover(filme_removido.id)
             if filme_removido.id in self.mapa_id_filme:
                 del self.mapa_id_filme[filme_removido.id]
+            self._desindexar_generos(filme_removido)
+            self._desindexar_consulta(filme_removido)
+            self.indice_colecoes.get(filme_removido.colecao_id, set()).discard(filme_removido.id)
+            self.cache_recomendacoes.invalidar([filme_removido.id])
+            self.versao_catalogo += 1
 
         return filme_removido
 
     def buscar_filmes(self, termo_busca):
-        """Retorna lista de filmes que contêm o termo no título."""
-        todos = self.avl.travessia_em_ordem(self.avl_root)
-        return [f for f in todos if termo_busca.lower() in f.titulo.lower()]
+        """Retorna lista de filmes que contêm o termo no título (em ordem de título)."""
+        filmes = [self.mapa_id_filme[i] for i in self.indice_titulos.buscar(termo_busca)]
+        filmes.sort(key=lambda f: f.chave)
+        return filmes
+
+    def autocompletar(self, prefixo, limite=10):
+        """Títulos que começam com `prefixo`, maior nota primeiro; retorna (sugestoes, total)."""
+        chave = normalizar_titulo(prefixo)
+        if not chave:
+            return [], 0
+
+        # Todo título com o prefixo fica em [chave, chave + maior caractere)
+        fim = chave + "\U0010ffff"
+        total = self.avl.posto(self.avl_root, fim) - self.avl.posto(self.avl_root, chave)
+        if limite <= 0:
+            return [], total
+        # A faixa custa `total` filmes; pelo ranking, cerca de limite·n/total até
+        # juntar `limite` com o prefixo. Vale o que for menor
+        if total > limite and limite * len(self.ranking_global) < total * total:
+            return self._melhores_com_prefixo(chave, limite), total
+        candidatos = self.avl.iterar_em_ordem(self.avl_root, inicio=chave, fim=fim)
+        if total <= limite:
+            sugestoes = sorted(candidatos, key=lambda f: f.nota, reverse=True)
+        else:
+            sugestoes = heapq.nlargest(limite, candidatos, key=lambda f: f.nota)
+        return sugestoes, total
+
+    def _melhores_com_prefixo(self, chave, limite):
+        """Os `limite` de maior nota cujo título começa com `chave`, pelo ranking global."""
+        na_avl, filmes = self.indice_titulos.ids, self.mapa_id_filme
+        escolhidos = []
+        for nota_neg, id_filme in self.ranking_global:
+            # Completa a lista e segue só pelos empatados com o último escolhido
+            if len(escolhidos) >= limite and nota_neg > escolhidos[limite - 1][0]:
+                break
+            if id_filme in na_avl and filmes[id_filme].chave.startswith(chave):
+                escolhidos.append((nota_neg, filmes[id_filme].chave, id_filme))
+        escolhidos.sort()  # empates em ordem de título, como na varredura da AVL
+        return [self.mapa_id_filme[i] for _, _, i in escolhidos[:limite]]
 
     def listar_todos(self):
         """Retorna lista completa ordenada."""
@@ -388,42 +1836,185 @@ class SistemaRecomendacao:
         Gera recomendações baseadas no filme_base.
         Retorna lista de tuplas: (Filme, motivo_string).
         """
-        if not filme_base: return []
-
-        recomendacoes_unicas = {}
-        generos_base = set(g.strip() for g in filme_base.genero.split('|') if g.strip())
+        return [(filme, motivo) for filme, motivo, _ in self.recomendacoes(filme_base)]
 
-        # 1. Varredura linear na AVL (O(n)) para similaridade de texto e gênero
-        #    (Necessário pois o grafo só conecta por nota estrita)
-        filmes = self.avl.travessia_em_ordem(self.avl_root)
-        LIMIAR_SIMILARIDADE = 0.8
-
-        for f in filmes:
-            if f.id == filme_base.id: continue
+    def recomendacoes(self, filme_base):
+        """
+        Recomendações do filme_base como (Filme, motivo, similaridade), servidas do cache
+        quando possível. similaridade é None para Nome/Franquia.
+        """
+        if not filme_base: return []
 
-            generos_atual = set(g.strip() for g in f.genero.split('|') if g.strip())
-            tem_genero_comum = not generos_base.isdisjoint(generos_atual)
+        recomendacoes = self.cache_recomendacoes.obter(filme_base.id)
+        if recomendacoes is None:
+            recomendacoes, dependencias = self._calcular_recomendacoes(filme_base)
+            self.cache_recomendacoes.guardar(filme_base.id, recomendacoes, dependencias)
+        return recomendacoes
 
-            if tem_genero_comum:
-                ratio = difflib.SequenceMatcher(None, filme_base.titulo.lower(), f.titulo.lower()).ratio()
-                if ratio >= LIMIAR_SIMILARIDADE or filme_base.titulo.lower() in f.titulo.lower():
-                    recomendacoes_unicas[f.id] = (f, "Nome/Franquia")
+    def _franquia(self, filme_base):
+        """
+        Filmes da franquia do filme_base (sem ele): os outros filmes da mesma coleção
+        (consulta direta no índice). Filmes sem coleção caem na similaridade de título
+        (MinHash/LSH + trigramas, confirmada com difflib), restrita a quem tem gênero em comum.
+        """
+        if filme_base.colecao_id:
+            return [f for f in self.filmes_da_colecao(filme_base.colecao_id) if f.id != filme_base.id]
+        ids_similares = self._similaridade_titulos().similares(
+            filme_base.titulo, filme_base.chave, LIMIAR_SIMILARIDADE_TITULO)
+        similares = [self.mapa_id_filme[i] for i in ids_similares if i != filme_base.id]
+        similares.sort(key=lambda f: f.chave)  # mesma ordem da AVL para os empates
+        return [f for f in similares if filme_base.mascara_generos & f.mascara_generos]
+
+    def _calcular_recomendacoes(self, filme_base):
+        """Retorna (recomendações, IDs de que elas dependem) para o cache."""
+        # 1. Franquia primeiro, da maior para a menor nota
+        recomendacoes_unicas = {f.id: (f, "Nome/Franquia", None) for f in self._franquia(filme_base)}
+        lista_final = sorted(recomendacoes_unicas.values(), key=lambda item: item[0].nota, reverse=True)
+
+        # 2. Busca pela melhor primeiro no grafo ponderado: só filmes de nota igual ou
+        #    maior, já na ordem de similaridade (gêneros, nota e ano)
+        expandidos = set()
+        similares_grafo = self.grafo_similaridade.mais_similares(
+            filme_base.id, aceitar=lambda id_filme: self.mapa_id_filme[id_filme].nota >= filme_base.nota,
+            expandidos=expandidos)
+
+        for id_filme, similaridade in similares_grafo:
+            if id_filme not in recomendacoes_unicas:
+                lista_final.append((self.mapa_id_filme[id_filme], "Gênero/Nota", similaridade))
+
+        dependencias = expandidos | recomendacoes_unicas.keys()
+        dependencias.add(filme_base.id)
+        return lista_final, dependencias
+
+    def recomendar_para_varios(self, filmes_base, limite=50):
+        """
+        Recomendações combinadas de vários filmes (ex.: a lista do usuário), sem repetidos
+        e sem os próprios filmes_base: as franquias de cada um e depois uma busca só no
+        grafo partindo de todos eles, com nota >= a menor nota entre eles.
+        Retorna [(Filme, motivo, similaridade), ...] como recomendacoes().
+        """
+        filmes_base = [f for f in filmes_base if f]
+        if not filmes_base: return []
+        ids_base = {f.id for f in filmes_base}
 
-        # 2. Busca em Largura (BFS) no Grafo para similaridade estrutural/nota
-        ids_grafo = self.grafo_similaridade.bfs(filme_base.id)
+        recomendacoes_unicas = {}
+        for base in filmes_base:
+            for f in self._franquia(base):
+                if f.id not in ids_base and f.id not in recomendacoes_unicas:
+                    recomendacoes_unicas[f.id] = (f, "Nome/Franquia", None)
+        lista_final = sorted(recomendacoes_unicas.values(), key=lambda item: item[0].nota, reverse=True)
+
+        nota_minima = min(f.nota for f in filmes_base)
+        similares_grafo = self.grafo_similaridade.mais_similares_de_varios(
+            ids_base, limite=limite, aceitar=lambda id_filme: self.mapa_id_filme[id_filme].nota >= nota_minima,
+            max_visitas=500 + len(ids_base))
+
+        for id_filme, similaridade in similares_grafo:
+            if id_filme not in recomendacoes_unicas:
+                lista_final.append((self.mapa_id_filme[id_filme], "Gênero/Nota", similaridade))
+        return lista_final
 
-        for id_filme in ids_grafo:
-            filme = self.mapa_id_filme.get(id_filme)
-            if filme and filme.nota >= filme_base.nota:
-                if filme.id not in recomendacoes_unicas:
-                    recomendacoes_unicas[filme.id] = (filme, "Gênero/Nota")
+    def recomendar_para_lista(self, filmes_base, limite=20, profundidade=2):
+        """
+        Recomendações personalizadas para uma lista de filmes (ex.: a do usuário), numa
+        travessia só do grafo a partir de todos eles: ganham os filmes alcançados por mais
+        filmes da lista e mais perto deles (Grafo.mais_alcancados). Sem os da lista.
+        Retorna [(Filme, pontuacao, quantos_filmes_da_lista_alcancam), ...].
+        """
+        ids_base = [f.id for f in filmes_base if f]
+        alcancados = self.grafo_similaridade.mais_alcancados(ids_base, limite, profundidade)
+        return [(self.mapa_id_filme[i], pontuacao, sementes) for i, pontuacao, sementes in alcancados]
 
-        # Ordenação final
-        lista_final = list(recomendacoes_unicas.values())
-        # Prioriza Nome/Franquia, depois a nota
-        lista_final.sort(key=lambda item: (1 if item[1] == "Nome/Franquia" else 0, item[0].nota), reverse=True)
+    def precomputar_recomendacoes(self, ids=None):
+        """
+        Calcula e guarda no cache as recomendações dos filmes dados (todos, se None),
+        ampliando a capacidade do cache para caberem todos. Retorna quantos foram calculados.
+        """
+        ids = list(self.mapa_id_filme) if ids is None else [i for i in ids if i in self.mapa_id_filme]
+        self.cache_recomendacoes.capacidade = max(self.cache_recomendacoes.capacidade, len(ids))
+        for id_filme in ids:
+            self.recomendacoes(self.mapa_id_filme[id_filme])
+        return len(ids)
 
-        return lista_final
+    def salvar_recomendacoes(self):
+        """
+        Grava o cache de recomendações em arquivo_recomendacoes; carregar_dados o
+        reaproveita enquanto o CSV não mudar. Lança ValueError se o catálogo foi
+        alterado desde a carga. Retorna quantas entradas foram gravadas.
+        """
+        if self.versao_catalogo != self.versao_da_carga:
+            raise ValueError("Catálogo alterado desde a carga: as recomendações não valem para o CSV.")
+        entradas = [(chave, [(f.id, similaridade) for f, _, similaridade in valor], dependencias)
+                    for chave, valor, dependencias in self.cache_recomendacoes.itens()]
+        escrever_recomendacoes(self.arquivo_recomendacoes, self.arquivo_csv, len(self.mapa_id_filme), entradas)
+        return len(entradas)
+
+    def _carregar_recomendacoes(self):
+        """Põe no cache as recomendações gravadas por salvar_recomendacoes, se valerem para este catálogo."""
+        entradas = ler_recomendacoes(self.arquivo_recomendacoes, self.arquivo_csv, len(self.mapa_id_filme))
+        mapa = self.mapa_id_filme
+        if entradas is None or not all(chave in mapa and all(i in mapa for i, _ in recomendacoes)
+                                       for chave, recomendacoes, _ in entradas):
+            return
+        cache = self.cache_recomendacoes
+        cache.capacidade = max(cache.capacidade, len(entradas))
+        for chave, recomendacoes, dependencias in entradas:
+            valor = [(mapa[i], "Nome/Franquia" if similaridade is None else "Gênero/Nota", similaridade)
+                     for i, similaridade in recomendacoes]
+            cache.guardar(chave, valor, dependencias)
+        self.estatisticas_carga['recomendacoes_precalculadas'] = len(entradas)
+
+    def _invalidar_recomendacoes_de_novo(self, filme):
+        """
+        Descarta do cache o que a inclusão de `filme` pode mudar: buscas que expandiram
+        um dos seus novos vizinhos no grafo, filmes da mesma coleção e, para filmes sem
+        coleção, aqueles cujo título passa a ter `filme` como parecido.
+        """
+        cache = self.cache_recomendacoes
+        cache.invalidar(self.grafo_similaridade.vizinhos(filme.id))
+        if filme.colecao_id:
+            for id_filme in self.indice_colecoes.get(filme.colecao_id, ()):
+                cache.descartar(id_filme)
+        titulo = filme.titulo.lower()
+        for id_filme in self._candidatos_titulo_parecido(filme):
+            outro = self.mapa_id_filme[id_filme]
+            if (id_filme != filme.id and id_filme in cache and not outro.colecao_id
+                    and outro.mascara_generos & filme.mascara_generos
+                    and titulos_parecidos(outro.titulo.lower(), titulo, LIMIAR_SIMILARIDADE_TITULO)):
+                cache.descartar(id_filme)
+
+    def _candidatos_titulo_parecido(self, filme):
+        """
+        IDs cuja busca de franquia por título acharia `filme` como candidato: os que
+        dividem uma banda LSH com ele e os de título contido no dele (via indice_chaves).
+        """
+        chaves = set()
+        indice = self.indice_similaridade
+        if indice is None:
+            return set()  # sem índice, nenhuma entrada do cache veio da busca por título
+        for banda in indice._bandas(filme.chave):
+            chaves.update(self.mapa_id_filme[i].chave for i in indice.baldes.get(banda, ()))
+
+        # Títulos contidos no do filme: para cada início, os pedaços crescentes que
+        # ainda são prefixo de alguma chave
+        chave = filme.chave
+        for inicio in range(len(chave)):
+            for fim in range(inicio + 1, len(chave) + 1):
+                pedaco = chave[inicio:fim]
+                p = bisect.bisect_left(self.indice_chaves, (pedaco,))
+                if p == len(self.indice_chaves) or not self.indice_chaves[p][0].startswith(pedaco):
+                    break
+                if self.indice_chaves[p][0] == pedaco:
+                    chaves.add(pedaco)
+
+        # Títulos repetidos ficam fora da AVL e do índice, mas têm a mesma chave
+        ids = set()
+        for c in chaves:
+            p = bisect.bisect_left(self.indice_chaves, (c,))
+            while p < len(self.indice_chaves) and self.indice_chaves[p][0] == c:
+                ids.add(self.indice_chaves[p][1])
+                p += 1
+        return ids
 
 # --- EXEMPLO DE USO ---
 # Como a classe não imprime nada, você deve chamar os métodos e tratar o retorno.
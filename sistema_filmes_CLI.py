@@ -1,7 +1,11 @@
+import bisect
 import csv
 import sys
 from collections import deque
-import difflib
+
+from sistema_filmes import (JANELA_VIZINHOS, LIMITE_DIFERENCA_NOTA, IndiceSimilaridadeTitulos,
+                            IndiceTrigramas, colecao_da_linha, escrever_snapshot, ler_snapshot,
+                            normalizar_titulo)
 
 
 # --- DEFINIÇÃO DAS ESTRUTURAS DE DADOS ---
@@ -9,12 +13,15 @@ import difflib
 class Filme:
     """Classe para armazenar os dados de um filme."""
 
-    def __init__(self, id, titulo, ano, genero, nota):
+    def __init__(self, id, titulo, ano, genero, nota, colecao_id=0, colecao=""):
         self.id = int(id)
         self.titulo = str(titulo)
         self.ano = int(ano)
         self.genero = str(genero)
         self.nota = float(nota)
+        self.colecao_id = int(colecao_id or 0)  # coleção/franquia do TMDB; 0 = avulso
+        self.colecao = str(colecao or "") if self.colecao_id else ""
+        self.chave = normalizar_titulo(self.titulo)  # usada pelos índices de título
 
     def __str__(self):
         """Representação em string para fácil impressão."""
@@ -293,9 +300,33 @@ class SistemaRecomendacao:
         self.grafo_similaridade = Grafo()
         self.mapa_id_filme = {}  # Hash map para busca rápida por ID (O(1))
         self.arquivo_csv = arquivo_csv
+        # Snapshot próprio da CLI: aqui os gêneros ficam como no CSV (sem tradução)
+        self.arquivo_snapshot = arquivo_csv + ".cli.snap"
         self.filmes_carregados = []  # Lista temporária para construir o grafo
+        self.indice_titulos = None  # Índice de trigramas (montado na primeira busca)
+        self.indice_similaridade = None  # MinHash/LSH dos títulos (idem)
+        self.indice_colecoes = {}  # collection_id -> {ids dos filmes da coleção}
+        self.indice_generos = None  # gênero -> [(nota, id), ...] ordenado (montado na primeira inserção)
 
     def carregar_dados(self):
+        # 1. Tenta o snapshot binário (evita reprocessar todas as avaliações do CSV)
+        dados = ler_snapshot(self.arquivo_snapshot, self.arquivo_csv)
+        if dados is not None:
+            registros, ordem, off_vizinhos, vizinhos = dados
+            filmes = [Filme(*registro) for registro in registros]
+            for i in ordem:
+                self.avl_root = self.avl.inserir(self.avl_root, filmes[i])
+            for filme in filmes:
+                self.grafo_similaridade.adicionar_vertice(filme.id)
+                self.mapa_id_filme[filme.id] = filme
+                if filme.colecao_id:
+                    self.indice_colecoes.setdefault(filme.colecao_id, set()).add(filme.id)
+            for i, filme in enumerate(filmes):
+                for j in vizinhos[off_vizinhos[i]:off_vizinhos[i + 1]]:
+                    self.grafo_similaridade.adicionar_aresta(filme.id, filmes[j].id)
+            print(f"Snapshot '{self.arquivo_snapshot}' carregado: {len(filmes)} filmes.")
+            return
+
         print(f"Lendo dados de '{self.arquivo_csv}'...")
         ids_vistos = set()  # CRUCIAL: Para não duplicar filmes
 
@@ -305,7 +336,8 @@ class SistemaRecomendacao:
                 header = next(leitor, None)  # Pula o cabeçalho: userId,movieId,rating,title,genre,vote_average
 
                 # Mapeamento manual baseado no output do Polars
-                # 0: userId, 1: movieId, 2: rating, 3: title, 4: genre, 5: vote_average, 7: year
+                # 0: userId, 1: movieId, 2: rating, 3: title, 4: genre, 5: vote_average, 7: year,
+                # 8: collection_id, 9: collection_name
 
                 count = 0
                 for linha in leitor:
@@ -329,14 +361,17 @@ class SistemaRecomendacao:
 
                         # Ano não temos mais, definimos padrão 0
                         ano = linha[7]
+                        colecao_id, colecao = colecao_da_linha(linha)
 
-                        filme = Filme(movie_id, titulo, ano, genero, nota)
+                        filme = Filme(movie_id, titulo, ano, genero, nota, colecao_id, colecao)
 
                         # Estruturas de Dados
                         self.avl_root = self.avl.inserir(self.avl_root, filme)
                         self.grafo_similaridade.adicionar_vertice(filme.id)
                         self.mapa_id_filme[filme.id] = filme
                         self.filmes_carregados.append(filme)
+                        if filme.colecao_id:
+                            self.indice_colecoes.setdefault(filme.colecao_id, set()).add(filme.id)
 
                         count += 1
                         if count % 5000 == 0:
@@ -348,6 +383,7 @@ class SistemaRecomendacao:
             print("Construindo grafo de similaridade (pode demorar)...")
             self._construir_arestas_grafo()
             print(f"Sucesso: {len(self.filmes_carregados)} filmes únicos carregados.")
+            self._salvar_snapshot()
 
         except FileNotFoundError as e:
             print(f"ERRO: Arquivo '{self.arquivo_csv}' não encontrado. \nMOTIVO: {e}")
@@ -370,9 +406,7 @@ class SistemaRecomendacao:
                     generos_map[g] = []
                 generos_map[g].append(filme)
 
-        # Configurações de similaridade
-        LIMITE_DIFERENCA_NOTA = 1.0
-        JANELA_VIZINHOS = 10
+        # Configurações de similaridade: LIMITE_DIFERENCA_NOTA e JANELA_VIZINHOS (de sistema_filmes)
 
         # 2. Processa cada grupo de gênero
         for genero, lista_filmes_genero in generos_map.items():
@@ -399,6 +433,17 @@ class SistemaRecomendacao:
 
         self.filmes_carregados = []
 
+    def _salvar_snapshot(self):
+        """Grava o snapshot binário para acelerar as próximas execuções."""
+        filmes = list(self.mapa_id_filme.values())
+        posicao = {filme.id: i for i, filme in enumerate(filmes)}
+        ordem = [posicao[f.id] for f in self.avl.travessia_em_ordem(self.avl_root)]
+        vizinhos = [[posicao[v] for v in self.grafo_similaridade.adj[filme.id]] for filme in filmes]
+        try:
+            escrever_snapshot(self.arquivo_snapshot, self.arquivo_csv, filmes, ordem, vizinhos)
+        except OSError as e:
+            print(f"Aviso: não foi possível gravar o snapshot. MOTIVO: {e}")
+
     def salvar_dados(self):
         """Salva o catálogo (da AVL, em ordem) de volta no CSV."""
         arquivo_saida = "filmes_catalogo_processado.csv"
@@ -439,11 +484,12 @@ class SistemaRecomendacao:
 
             # 3. Insere no Mapa de ID
             self.mapa_id_filme[filme.id] = filme
+            if self.indice_titulos is not None:
+                self.indice_titulos.adicionar(filme.id, filme.chave)
+                self.indice_similaridade.adicionar(filme.id, filme.chave)
 
-            # 4. Atualiza arestas do grafo para o novo filme
-            for outro_id, outro_filme in self.mapa_id_filme.items():
-                if outro_id != filme.id and outro_filme.genero == filme.genero:
-                    self.grafo_similaridade.adicionar_aresta(filme.id, outro_id)
+            # 4. Liga o novo filme aos vizinhos de nota em cada gênero (mesma regra da carga)
+            self._conectar_no_grafo(filme)
 
             print(f"\nFilme '{titulo}' adicionado com sucesso.")
 
@@ -469,9 +515,59 @@ class SistemaRecomendacao:
         # 3. Remove do Mapa de ID
         if filme_removido.id in self.mapa_id_filme:
             del self.mapa_id_filme[filme_removido.id]
+        if self.indice_titulos is not None:
+            self.indice_titulos.remover(filme_removido.id, filme_removido.chave)
+            self.indice_similaridade.remover(filme_removido.id)
+        self.indice_colecoes.get(filme_removido.colecao_id, set()).discard(filme_removido.id)
+        if self.indice_generos is not None:
+            chave = (filme_removido.nota, filme_removido.id)
+            for g in self._generos_do_filme(filme_removido):
+                lista = self.indice_generos.get(g, [])
+                i = bisect.bisect_left(lista, chave)
+                if i < len(lista) and lista[i] == chave:
+                    del lista[i]
 
         print(f"Filme '{filme_removido.titulo}' removido com sucesso.")
 
+    def _generos_do_filme(self, filme):
+        return {g.strip() for g in filme.genero.split('|') if g.strip()}
+
+    def _conectar_no_grafo(self, filme):
+        """
+        Liga um filme novo: em cada gênero, até JANELA_VIZINHOS filmes de cada lado na
+        ordem de nota, com diferença de nota até LIMITE_DIFERENCA_NOTA. Usa bisseção no
+        índice de gêneros: O(g·log n). Aproxima _construir_arestas_grafo, mas não o
+        reproduz: entre notas empatadas o índice está em ordem de id (a carga usa a
+        ordem de leitura), e as janelas dos filmes já ligados não são refeitas.
+        """
+        # Monta o índice na primeira inserção, a partir do mapa de filmes
+        if self.indice_generos is None:
+            self.indice_generos = {}
+            for outro in self.mapa_id_filme.values():
+                if outro.id != filme.id:
+                    for g in self._generos_do_filme(outro):
+                        self.indice_generos.setdefault(g, []).append((outro.nota, outro.id))
+            for lista in self.indice_generos.values():
+                lista.sort()
+
+        for g in self._generos_do_filme(filme):
+            lista = self.indice_generos.setdefault(g, [])
+            bisect.insort(lista, (filme.nota, filme.id))
+            # Antes dessa posição ficam os empatados (em ordem de id) e as notas menores;
+            # depois, as notas maiores
+            p = bisect.bisect_right(lista, (filme.nota, float('inf')))
+            ligados = 0
+            for q in range(p - 1, -1, -1):
+                if ligados == JANELA_VIZINHOS or filme.nota - lista[q][0] > LIMITE_DIFERENCA_NOTA:
+                    break
+                if lista[q][1] != filme.id:
+                    self.grafo_similaridade.adicionar_aresta(filme.id, lista[q][1])
+                    ligados += 1
+            for q in range(p, min(p + JANELA_VIZINHOS, len(lista))):
+                if lista[q][0] - filme.nota > LIMITE_DIFERENCA_NOTA:
+                    break
+                self.grafo_similaridade.adicionar_aresta(filme.id, lista[q][1])
+
     def _exibir_detalhes_filme(self, filme):
         """Método auxiliar para formatar a exibição de um filme."""
         if not filme:
@@ -485,6 +581,8 @@ class SistemaRecomendacao:
         print(f"Ano:    {filme.ano}")
         print(f"Gênero: {filme.genero}")
         print(f"Nota:   {filme.nota:.1f}")  # Adicionei .1f para formatar decimal
+        if filme.colecao:
+            print(f"Coleção: {filme.colecao}")
         print("=" * 40)
 
     def _buscar_filme(self):
@@ -533,9 +631,21 @@ class SistemaRecomendacao:
         print(f"\nBuscando recomendações para: {filme_base.titulo} (Gênero: {filme_base.genero})")
         recomendacoes_unicas = {}
         generos_base = set(g.strip() for g in filme_base.genero.split('|') if g.strip())
-        filmes = self.avl.travessia_em_ordem(self.avl_root)
         LIMIAR_SIMILARIDADE = 0.8
 
+        # Franquia: se o filme pertence a uma coleção, basta consultar o índice de coleções
+        if filme_base.colecao_id:
+            for id_filme in self.indice_colecoes.get(filme_base.colecao_id, ()):
+                if id_filme != filme_base.id:
+                    recomendacoes_unicas[id_filme] = (self.mapa_id_filme[id_filme], "[Franquia/Nome]")
+            filmes = []
+        else:
+            # Sem coleção: candidatos por título via MinHash/LSH + trigramas (sem varrer o
+            # catálogo), confirmados pela mesma regra (ratio >= limiar ou inclusão do título)
+            self._montar_indices_titulos()
+            ids_similares = self.indice_similaridade.similares(filme_base.titulo, filme_base.chave, LIMIAR_SIMILARIDADE)
+            filmes = sorted((self.mapa_id_filme[i] for i in ids_similares), key=lambda f: f.titulo.lower().strip())
+
         for f in filmes:
             if f.id == filme_base.id: continue
 
@@ -548,12 +658,7 @@ class SistemaRecomendacao:
             tem_genero_em_comum = not generos_base.isdisjoint(generos_atual)
 
             if tem_genero_em_comum:
-                # Só calcula similaridade de nome se o gênero bater
-                ratio = difflib.SequenceMatcher(None, filme_base.titulo.lower(), f.titulo.lower()).ratio()
-
-                # Verifica similaridade OU inclusão (ex: "Toy Story" in "Toy Story 3")
-                if ratio >= LIMIAR_SIMILARIDADE or filme_base.titulo.lower() in f.titulo.lower():
-                    recomendacoes_unicas[f.id] = (f, "[Franquia/Nome]")
+                recomendacoes_unicas[f.id] = (f, "[Franquia/Nome]")
 
         # 2. Executa BFS no Grafo
         ids_recomendados = self.grafo_similaridade.bfs(filme_base.id)
@@ -581,18 +686,29 @@ class SistemaRecomendacao:
             print(f"{i + 1}. {filme}, {motivo}")
         print("---------------------------------")
 
+    def _montar_indices_titulos(self):
+        """Monta (uma vez) os índices de trigramas e de similaridade a partir da AVL."""
+        if self.indice_titulos is not None:
+            return
+        self.indice_titulos = IndiceTrigramas(self.mapa_id_filme)
+        self.indice_similaridade = IndiceSimilaridadeTitulos(self.indice_titulos)
+        for filme in self.avl.travessia_em_ordem(self.avl_root):
+            self.indice_titulos.adicionar(filme.id, filme.chave)
+            self.indice_similaridade.adicionar(filme.id, filme.chave)
+
     def _selecionar_filme_interativo(self, termo_busca):
         """
-        1. Usa a AVL para gerar a lista ordenada (O(n)).
-        2. Filtra por substring (Abordagem de Lista).
+        1. Usa o índice de trigramas para achar os títulos com o termo (substring).
+        2. Ordena os candidatos por título (mesma ordem da AVL).
         3. Se houver múltiplos resultados, pede para o usuário escolher um (Interativo).
         Retorna o objeto Filme escolhido ou None.
         """
-        # 1. Pega todos os filmes da árvore (já vem ordenado por título)
-        todos_filmes = self.avl.travessia_em_ordem(self.avl_root)
+        # 1. Monta o índice na primeira busca, a partir dos filmes da árvore
+        self._montar_indices_titulos()
 
         # 2. Filtra quem tem o termo no título (Case Insensitive)
-        candidatos = [f for f in todos_filmes if termo_busca.lower() in f.titulo.lower()]
+        candidatos = [self.mapa_id_filme[i] for i in self.indice_titulos.buscar(termo_busca)]
+        candidatos.sort(key=lambda f: f.titulo.lower().strip())
 
         if not candidatos:
             print(f"Nenhum filme encontrado com o termo '{termo_busca}'.")
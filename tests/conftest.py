@@ -0,0 +1,49 @@
+import csv
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sistema_filmes import SistemaRecomendacao  # noqa: E402
+
+GENEROS = ["Action", "Adventure", "Comedy", "Drama", "Animation", "Fantasy",
+           "Horror", "Science Fiction", "Crime", "Thriller", "Romance", "Family"]
+PALAVRAS = "star wars toy story love night dark city man woman return king lost day amélie the of a in".split()
+
+
+def escrever_catalogo(caminho, n_filmes=600, n_linhas=3000, semente=1):
+    """CSV sintético no formato do data.csv: títulos com continuações, coleções e avaliações repetidas."""
+    aleatorio = random.Random(semente)
+    filmes = []
+    for i in range(1, n_filmes + 1):
+        titulo = " ".join(aleatorio.choice(PALAVRAS) for _ in range(aleatorio.randint(1, 4))).title()
+        if i % 7 == 0:
+            titulo = filmes[-1][1] + " 2"
+        if i % 3 == 0:
+            titulo += f" {i % 13}"
+        colecao = (i % 40 + 1, f"Coleção {i % 40 + 1}") if i % 5 == 0 else ("", "")
+        filmes.append((i, titulo, "|".join(aleatorio.sample(GENEROS, aleatorio.randint(1, 3))),
+                       round(aleatorio.uniform(0, 10), 1), aleatorio.randint(1930, 2017), *colecao))
+
+    with open(caminho, "w", newline="", encoding="utf-8") as f:
+        escritor = csv.writer(f)
+        escritor.writerow(["userId", "movieId", "rating", "title", "genres", "vote_average",
+                           "release_date", "release_year", "collection_id", "collection_name"])
+        for r in range(n_linhas):
+            id_filme, titulo, generos, nota, ano, colecao_id, colecao = (
+                filmes[r] if r < n_filmes else filmes[aleatorio.randrange(n_filmes)])
+            escritor.writerow([aleatorio.randint(1, 1000), id_filme, aleatorio.randint(1, 5), titulo, generos,
+                               nota, f"{ano}-05-01", ano, colecao_id, colecao])
+
+
+@pytest.fixture
+def sistema(tmp_path):
+    """SistemaRecomendacao carregado de um catálogo sintético de 600 filmes."""
+    caminho = str(tmp_path / "data.csv")
+    escrever_catalogo(caminho)
+    s = SistemaRecomendacao(caminho)
+    s.carregar_dados(usar_snapshot=False)
+    return s
@@ -0,0 +1,21 @@
+import pytest
+
+from sistema_filmes import SistemaRecomendacao
+
+CABECALHO = "userId,movieId,rating,title,genres,vote_average,release_date,release_year,collection_id,collection_name"
+
+
+@pytest.mark.parametrize("modo", ["rapido", "paralelo", "csv"])
+def test_titulo_em_varias_linhas_nao_derruba_a_carga(tmp_path, modo):
+    caminho = tmp_path / "data.csv"
+    caminho.write_text("\n".join([
+        CABECALHO,
+        "1,5001,4,Alpha,Drama,7.0,2000-01-01,2000,,",
+        '1,5002,4,"Beta quebrado',
+        '9,5007,x",Drama,6.0,2001-01-01,2001,,',
+        "2,5003,3,Gamma,Action,5.0,2002-01-01,2002,,",
+    ]) + "\n", encoding="utf-8")
+    sistema = SistemaRecomendacao(str(caminho))
+    sistema.carregar_dados(usar_snapshot=False, modo=modo)
+    assert 5003 in sistema.mapa_id_filme
+    assert 5007 not in sistema.mapa_id_filme
@@ -0,0 +1,68 @@
+import math
+import random
+
+import pytest
+
+from sistema_filmes import CHAVES_ORDENACAO, normalizar_titulo
+
+
+def consulta_bruta(filmes, ano_min, ano_max, nota_min, nota_max, generos, todos, prefixo, ordenar, limite):
+    resultado = []
+    for f in filmes:
+        if ano_min is not None and f.ano < ano_min or ano_max is not None and f.ano > ano_max:
+            continue
+        if nota_min is not None and f.nota < nota_min or nota_max is not None and f.nota > nota_max:
+            continue
+        if generos:
+            do_filme = set(f.genero.split('|'))
+            if (todos and not set(generos) <= do_filme) or (not todos and not set(generos) & do_filme):
+                continue
+        if prefixo and not f.chave.startswith(normalizar_titulo(prefixo)):
+            continue
+        resultado.append(f)
+    resultado.sort(key=CHAVES_ORDENACAO[ordenar])
+    return resultado[:limite]
+
+
+def test_consultar_bate_com_forca_bruta(sistema):
+    aleatorio = random.Random(2)
+    filmes = list(sistema.mapa_id_filme.values())
+    generos = sistema.listar_generos()
+    anos = sorted(f.ano for f in filmes)
+    for _ in range(1000):
+        consulta = dict(
+            ano_min=aleatorio.choice([None, aleatorio.choice(anos)]),
+            ano_max=aleatorio.choice([None, aleatorio.choice(anos)]),
+            nota_min=aleatorio.choice([None, round(aleatorio.uniform(0, 10), 1)]),
+            nota_max=aleatorio.choice([None, round(aleatorio.uniform(0, 10), 1)]),
+            generos=aleatorio.choice([None, aleatorio.sample(generos, aleatorio.randint(1, 3))]),
+            todos=aleatorio.random() < 0.5,
+            prefixo=aleatorio.choice([None, None, aleatorio.choice(filmes).titulo[:aleatorio.randint(1, 4)]]),
+            ordenar=aleatorio.choice(list(CHAVES_ORDENACAO)),
+            limite=aleatorio.choice([1, 5, 20, 100]))
+        resultado, _ = sistema.consultar(*consulta.values())
+        assert [f.id for f in resultado] == [f.id for f in consulta_bruta(filmes, **consulta)], consulta
+
+
+@pytest.mark.parametrize("argumentos", [
+    {"limite": 0}, {"limite": -1}, {"nota_min": math.nan}, {"nota_max": math.nan}, {"ordenar": "id"},
+])
+def test_consultar_rejeita_parametros_invalidos(sistema, argumentos):
+    with pytest.raises(ValueError):
+        sistema.consultar(**argumentos)
+
+
+def test_autocompletar_bate_com_forca_bruta(sistema):
+    aleatorio = random.Random(1)
+    titulos = [f.titulo for f in sistema.mapa_id_filme.values()]
+    na_avl = sistema.listar_todos()
+    for _ in range(300):
+        prefixo = aleatorio.choice(titulos)[:aleatorio.randint(1, 4)]
+        limite = aleatorio.choice([1, 5, 10, 50])
+        chave = normalizar_titulo(prefixo)
+        candidatos = [f for f in na_avl if f.chave.startswith(chave)]
+        esperado = sorted(candidatos, key=lambda f: -f.nota)[:limite]
+        sugestoes, total = sistema.autocompletar(prefixo, limite)
+        assert [f.id for f in sugestoes] == [f.id for f in esperado]
+        assert total == len(candidatos)
+    assert sistema.autocompletar("a", 0) == ([], sum(f.chave.startswith("a") for f in na_avl))
@@ -0,0 +1,122 @@
+import random
+from collections import deque
+
+from sistema_filmes import Grafo
+
+
+def adjacencia(grafo):
+    return {id_filme: set(grafo.vizinhos(id_filme)) for id_filme in grafo.indice}
+
+
+def conferir(grafo, referencia):
+    adj = adjacencia(grafo)
+    assert adj == referencia
+    assert all(a in adj[b] for a, vizinhos in adj.items() for b in vizinhos)  # simétrico
+    assert grafo.total_arestas() == sum(len(v) for v in referencia.values()) // 2
+
+
+def grafo_aleatorio(aleatorio, n=80, arestas=300):
+    grafo, referencia = Grafo(), {}
+    for id_filme in range(1, n + 1):
+        grafo.adicionar_vertice(id_filme, 1 << aleatorio.randrange(5), aleatorio.uniform(0, 10), 2000)
+        referencia[id_filme] = set()
+    linhas = [[] for _ in range(n)]
+    for _ in range(arestas):
+        a, b = aleatorio.sample(range(1, n + 1), 2)
+        # Repetidas e nos dois sentidos, como na carga em lote
+        linhas[a - 1].append(b - 1)
+        linhas[b - 1].append(a - 1)
+        referencia[a].add(b)
+        referencia[b].add(a)
+    grafo.compactar(linhas)
+    return grafo, referencia
+
+
+def test_compactar_em_lote_deduplica():
+    grafo, referencia = grafo_aleatorio(random.Random(1))
+    conferir(grafo, referencia)
+    assert not grafo.extras and not grafo.removidos
+
+
+def test_camada_mutavel_e_compactacao_batem_com_referencia():
+    aleatorio = random.Random(2)
+    grafo, referencia = grafo_aleatorio(aleatorio)
+    proximo = 1000
+    for passo in range(600):
+        operacao = aleatorio.random()
+        if operacao < 0.35 and referencia:
+            removido = aleatorio.choice(list(referencia))
+            grafo.remover_vertice(removido)
+            for vizinho in referencia.pop(removido):
+                referencia[vizinho].discard(removido)
+        elif operacao < 0.6:
+            grafo.adicionar_vertice(proximo, 1, 5.0, 1999)
+            referencia[proximo] = set()
+            proximo += 1
+        elif len(referencia) > 1:
+            a, b = aleatorio.sample(list(referencia), 2)
+            grafo.adicionar_aresta(a, b)
+            grafo.adicionar_aresta(a, b)  # repetida: não conta duas vezes
+            referencia[a].add(b)
+            referencia[b].add(a)
+        if passo % 50 == 0:
+            conferir(grafo, referencia)
+        if passo % 150 == 149:
+            grafo.compactar()
+            assert not grafo.extras and not grafo.removidos
+            conferir(grafo, referencia)
+    conferir(grafo, referencia)
+
+
+def test_atributos_acompanham_a_compactacao():
+    grafo = Grafo()
+    for id_filme in range(10):
+        grafo.adicionar_vertice(id_filme, 1 << id_filme, float(id_filme), 1990 + id_filme)
+    for id_filme in (2, 5, 7):
+        grafo.remover_vertice(id_filme)
+    grafo.compactar()
+    for id_filme in (0, 1, 3, 4, 6, 8, 9):
+        i = grafo.indice[id_filme]
+        assert (grafo.ids[i], grafo.mascaras[i], grafo.notas[i], grafo.anos[i]) == \
+            (id_filme, 1 << id_filme, float(id_filme), 1990 + id_filme)
+
+
+def test_mascaras_com_mais_de_64_generos():
+    grafo = Grafo()
+    grafo.adicionar_vertice(1, 1 << 70 | 1, 5.0, 2000)
+    grafo.adicionar_vertice(2, 1 << 70, 5.0, 2000)
+    grafo.compactar()
+    # Jaccard 1/2, mesma nota, mesmo ano
+    assert abs(grafo.peso(1, 2) - (0.5 * 0.5 + 0.3 + 0.2)) < 1e-9
+
+
+def test_definir_csr_adota_os_arrays():
+    origem, referencia = grafo_aleatorio(random.Random(3))
+    grafo = Grafo()
+    for id_filme in origem.ids:
+        grafo.adicionar_vertice(id_filme)
+    grafo.definir_csr(origem.offsets, origem.adjacentes)
+    conferir(grafo, referencia)
+
+
+def test_bfs_percorre_o_componente():
+    aleatorio = random.Random(4)
+    grafo, referencia = grafo_aleatorio(aleatorio, n=60, arestas=70)
+    grafo.adicionar_vertice(500)
+    grafo.adicionar_aresta(500, 1)
+    referencia[500] = {1}
+    referencia[1].add(500)
+    grafo.remover_vertice(2)
+    for vizinho in referencia.pop(2):
+        referencia[vizinho].discard(2)
+
+    for inicio in referencia:
+        vistos, fila = {inicio}, deque([inicio])
+        while fila:
+            for vizinho in referencia[fila.popleft()]:
+                if vizinho not in vistos:
+                    vistos.add(vizinho)
+                    fila.append(vizinho)
+        resultado = grafo.bfs(inicio, limite=10 ** 6)
+        assert len(resultado) == len(set(resultado))
+        assert set(resultado) == vistos - {inicio}
@@ -0,0 +1,90 @@
+import random
+from collections import deque
+
+
+def como_ids(recomendacoes):
+    return [(f.id, motivo, similaridade) for f, motivo, similaridade in recomendacoes]
+
+
+def test_cache_bate_com_calculo_novo_apos_edicoes(sistema):
+    aleatorio = random.Random(3)
+    sistema.precomputar_recomendacoes()
+    titulos = [f.titulo for f in sistema.mapa_id_filme.values()]
+    filmes = list(sistema.mapa_id_filme.values())
+
+    for rodada in range(300):
+        if aleatorio.random() < 0.5:
+            base = aleatorio.choice(titulos)
+            colecao = aleatorio.choice([(0, ""), (0, ""), (aleatorio.choice(filmes).colecao_id, "X")])
+            sistema.adicionar_filme(800000 + rodada, f"{base} Novo{rodada}", 2000,
+                                    aleatorio.choice(["Ação", "Drama|Comédia", "Terror|Ação"]),
+                                    round(aleatorio.uniform(0, 10), 1), *colecao)
+        else:
+            sistema.remover_filme(aleatorio.choice(list(sistema.mapa_id_filme.values())).titulo)
+        for id_filme in aleatorio.sample(list(sistema.mapa_id_filme), 4):
+            filme = sistema.mapa_id_filme[id_filme]
+            assert como_ids(sistema.recomendacoes(filme)) == como_ids(sistema._calcular_recomendacoes(filme)[0])
+
+
+def test_inclusao_com_titulo_parecido_invalida_o_cache(sistema):
+    aleatorio = random.Random(7)
+    sistema.precomputar_recomendacoes()
+    avulsos = [f.titulo for f in sistema.mapa_id_filme.values() if not f.colecao_id]
+    for rodada in range(8):
+        letras = list(aleatorio.choice(avulsos))
+        letras[aleatorio.randrange(len(letras))] = aleatorio.choice("xyzáe ")
+        titulo = "".join(letras)
+        if sistema.obter_filme_por_titulo_exato(titulo):
+            continue
+        sistema.adicionar_filme(700000 + rodada, titulo, 2000, "Ação|Drama|Comédia", 5.0)
+        for id_filme in sistema.cache_recomendacoes.chaves():
+            filme = sistema.mapa_id_filme[id_filme]
+            assert (como_ids(sistema.cache_recomendacoes.obter(id_filme))
+                    == como_ids(sistema._calcular_recomendacoes(filme)[0]))
+
+
+def test_recomendacoes_gravadas_voltam_iguais(sistema):
+    sistema.precomputar_recomendacoes()
+    assert sistema.salvar_recomendacoes() == len(sistema.mapa_id_filme)
+
+    from sistema_filmes import SistemaRecomendacao
+    outro = SistemaRecomendacao(sistema.arquivo_csv)
+    outro.carregar_dados()
+    assert outro.estatisticas_carga['recomendacoes_precalculadas'] == len(sistema.mapa_id_filme)
+    for id_filme in list(sistema.mapa_id_filme)[:100]:
+        assert (como_ids(outro.cache_recomendacoes.obter(id_filme))
+                == como_ids(sistema.cache_recomendacoes.obter(id_filme)))
+
+
+def alcance_bruto(sistema, sementes, profundidade):
+    pontos, contagem = {}, {}
+    for semente in sementes:
+        distancia, fila = {semente: 0}, deque([semente])
+        while fila:
+            v = fila.popleft()
+            if distancia[v] == profundidade:
+                continue
+            for w in sistema.grafo_similaridade.vizinhos(v):
+                if w not in distancia:
+                    distancia[w] = distancia[v] + 1
+                    fila.append(w)
+        for w, d in distancia.items():
+            if d and w not in sementes:
+                pontos[w] = pontos.get(w, 0) + 0.5 ** (d - 1)
+                contagem[w] = contagem.get(w, 0) + 1
+    return pontos, contagem
+
+
+def test_mais_alcancados_bate_com_bfs_por_semente(sistema):
+    aleatorio = random.Random(4)
+    for rodada in range(40):
+        if rodada == 20:  # passa pela camada mutável do grafo
+            for k in range(30):
+                sistema.adicionar_filme(600000 + k, f"zz ms {k}", 2000, "Drama", 6.0)
+            sistema.remover_filme(next(iter(sistema.mapa_id_filme.values())).titulo)
+        sementes = set(aleatorio.sample(list(sistema.mapa_id_filme), aleatorio.randint(1, 40)))
+        profundidade = aleatorio.randint(1, 3)
+        resultado = sistema.grafo_similaridade.mais_alcancados(sementes, limite=10 ** 9, profundidade=profundidade)
+        pontos, contagem = alcance_bruto(sistema, sementes, profundidade)
+        assert {i for i, _, _ in resultado} == pontos.keys()
+        assert all(abs(p - pontos[i]) < 1e-9 and c == contagem[i] for i, p, c in resultado)
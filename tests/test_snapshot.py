@@ -0,0 +1,39 @@
+import pytest
+
+from sistema_filmes import SistemaRecomendacao, ler_snapshot
+
+
+def test_snapshot_reproduz_a_carga_do_csv(sistema):
+    do_snapshot = SistemaRecomendacao(sistema.arquivo_csv)
+    sistema._salvar_snapshot()
+    do_snapshot.carregar_dados()
+    assert do_snapshot.estatisticas_carga['origem'] == 'snapshot'
+    assert [f.id for f in do_snapshot.listar_todos()] == [f.id for f in sistema.listar_todos()]
+    for id_filme, filme in sistema.mapa_id_filme.items():
+        outro = do_snapshot.mapa_id_filme[id_filme]
+        assert (outro.titulo, outro.ano, outro.genero, outro.nota, outro.colecao_id) == \
+            (filme.titulo, filme.ano, filme.genero, filme.nota, filme.colecao_id)
+        assert sorted(do_snapshot.grafo_similaridade.vizinhos(id_filme)) == \
+            sorted(sistema.grafo_similaridade.vizinhos(id_filme))
+
+
+@pytest.mark.parametrize("danificar", [
+    lambda dados: b"",
+    lambda dados: dados[:20],
+    lambda dados: dados[:-400],
+    lambda dados: dados[:-3],
+    lambda dados: dados + b"xxxx",
+    lambda dados: dados[:-5] + b"\xff\xfe" + dados[-3:],
+])
+def test_snapshot_danificado_e_rejeitado(sistema, danificar):
+    sistema._salvar_snapshot()
+    with open(sistema.arquivo_snapshot, 'rb') as f:
+        dados = f.read()
+    with open(sistema.arquivo_snapshot, 'wb') as f:
+        f.write(danificar(dados))
+    assert ler_snapshot(sistema.arquivo_snapshot, sistema.arquivo_csv) is None
+
+    recarregado = SistemaRecomendacao(sistema.arquivo_csv)
+    recarregado.carregar_dados()
+    assert recarregado.estatisticas_carga['origem'] == 'csv'
+    assert len(recarregado.mapa_id_filme) == len(sistema.mapa_id_filme)